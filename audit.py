@@ -1,9 +1,32 @@
 import os
 import sys
 import re
+import gzip
+import zlib
+import json
+import time
+import hashlib
+import asyncio
+import sqlite3
 import urllib.parse
+import argparse
+import contextlib
+import io
+import threading
+import queue
+import http.server
+import csv
+import glob
+import functools
+import fnmatch
+import itertools
 import xml.etree.ElementTree as ET
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from html.parser import HTMLParser
+from redirects import Redirects, REDIRECTS_FILE
 
 # Colors
 class Colors:
@@ -37,23 +60,94 @@ try:
 except ImportError:
     HAS_REQUESTS = False
 
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+try:
+    import lxml
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
 # Configuration
 ROOT_DIR = "."
 SITE_DOMAIN = "x-grok.top"
 SITE_URL = f"https://{SITE_DOMAIN}"
 CONVERSION_KEYWORDS = ["Grok 4.1 独享成品号", "sidebar_card", "sidebar-card"]
 IGNORE_PREFIXES = ["/go/", "/legal"] # Ignore these paths for 404 checks
+IMPLICIT_FRAGMENTS = {"top"} # 浏览器内置的锚点，无需对应 id
 SKIP_FILES = ["404.html", "googlea685aa8ff3686b48.html"]
+INDEX_SKIP_DIRS = {".git", ".cache", ".build", "node_modules", "__pycache__"} # 不属于站点内容的目录
+SCAN_IGNORE = ["MasterTool/", "templates/", "assets/", "google*.html", "baidu_verification.html"] # 不审计的目录 / 页面 (fnmatch, 以 / 结尾表示目录)
+PARSER_BACKENDS = ["html.parser", "lxml", "stream"] # --parser 可选值, 见 extract_page_facts()
+PARALLEL_MIN_PAGES = 64 # 页面数少于此值时串行审计 (进程池启动开销大于收益)
+
+# Render cost (RenderCostRule)
+INLINE_SCRIPT_TYPES = ("text/javascript", "application/javascript", "module") # ld+json 等数据脚本不计入
+LCP_MIN_IMAGE_SIZE = 100 # width/height 小于此值 (px) 的图片不作为 LCP 候选
+FOLD_IMAGES = 2 # <header> 内的图片及正文前 N 张图片视为首屏，应立即加载，不计入未懒加载
+RENDER_COST_WEIGHTS = { # 排序用的加权分
+    "blocking": 3, # 每个阻塞渲染的资源
+    "images_no_size": 1, # 每张未声明宽高的图片 (CLS)
+    "images_no_lazy": 0.5, # 每张首屏外未懒加载的图片
+    "inline_kb": 0.2, # 每 KB 内联 script/style
+    "dom_nodes_k": 2, # 每 1000 个 DOM 节点
+    "lcp_lazy": 5, # LCP 候选图被懒加载
+}
+RENDER_REPORT_TOP = 10
+
+# Link equity (internal PageRank)
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOL = 1e-10 # 收敛阈值 (L1)
+PAGERANK_MAX_ITER = 100
+IMPRESSIONS_CSV = "*网页*.csv" # GSC 网页导出 (与 matrix_seo_analyzer.py 相同)
+EQUITY_REPORT_TOP = 10
+EQUITY_MISMATCH_RATIO = 4 # 权重占比与曝光占比相差超过此倍数时提示
+
+# Link checker (absolute internal links)
+LINK_CHECK_CONCURRENCY = 20 # 全局并发请求数
+LINK_CHECK_PER_HOST = 4 # 单个域名并发请求数
+LINK_CHECK_TIMEOUT = 5 # 单次请求超时 (秒)
+LINK_CHECK_RETRIES = 2 # 超时 / 5xx / 429 重试次数
+LINK_CHECK_BACKOFF = 0.5 # 重试退避基数 (秒)，按 2^n 增长
+MAX_REDIRECT_HOPS = 5 # 跟随跳转链的最大跳数
+PAGE_FACTS_FILE = os.path.join(".cache", "audit", "page_facts.json")
+PAGE_FACTS_VERSION = 5 # 修改 extract_page_facts() 的提取逻辑时递增，使旧缓存失效
+LINK_CACHE_FILE = os.path.join(".cache", "audit", "link_status.sqlite3")
+LINK_CACHE_TTL = { # 持久化链接状态的有效期 (秒)
+    "ok": 7 * 86400, # 2xx
+    "redirect": 86400, # 3xx
+    "client_error": 6 * 3600, # 4xx
+    "error": 600, # 5xx / 超时 / 连接失败
+}
+
+# Daemon (--watch)
+WATCH_INTERVAL = 0.5 # 轮询文件变化的间隔 (秒)
+WATCH_LONG_POLL = 30 # /findings?since=N 最长等待 (秒)
+
+# Live crawl (--crawl BASE_URL)
+CRAWL_CONCURRENCY = 8 # 同时抓取的页面数
+CRAWL_MAX_PAGES = 500 # 单次抓取的页面上限
+CRAWL_TIMEOUT = 15 # 单页超时 (秒)
+CRAWL_ACCEPT_ENCODING = "gzip, deflate"
+CRAWL_SLOW_TTFB = 0.6 # TTFB 超过此值 (秒) 视为慢
+CRAWL_SLOW_TOTAL = 2.0 # 总耗时超过此值 (秒) 视为慢
+CRAWL_COMPRESS_MIN_BYTES = 1024 # 小于此大小的响应不要求压缩
+CRAWL_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml")
 
 # Data structures
 all_html_files = set()
-linked_pages = set()
-inbound_links = defaultdict(list) # target_page -> [source_pages]
-external_links_map = defaultdict(list) # external_url -> [source_pages]
-unsafe_external_links = defaultdict(set) # external_url -> {source_pages_with_issues}
-soft_routing_map = defaultdict(list) # soft_route -> [source_pages]
 clean_url_issues = []
-redirect_issues = [] # (source_page, link_url, status_code, final_url)
+redirect_issues = [] # "[source_page] ... redirect chain" messages
 sitemap_xml_urls = set()
 sitemap_html_urls = set()
 errors = []
@@ -63,30 +157,115 @@ stats = {
     "pages_scanned": 0,
     "internal_links": 0,
     "external_links": 0,
+    "pages_reparsed": 0,
+    "link_requests": 0,
+    "link_revalidated": 0,
 }
+rule_stats = defaultdict(lambda: [0, 0, 0.0]) # rule -> [calls, findings, seconds] over re-parsed pages
 # Cache for redirect checks to avoid repeated requests
-link_status_cache = {} 
-
-def get_html_files(root_dir):
-    files = []
-    # Explicitly check root files
-    with os.scandir(root_dir) as entries:
-        for entry in entries:
-            if entry.is_file() and entry.name.endswith('.html'):
-                files.append(entry.name)
-    
-    # Check blog directory
-    blog_dir = os.path.join(root_dir, 'blog')
-    if os.path.exists(blog_dir):
-        for entry in os.scandir(blog_dir):
-            if entry.is_file() and entry.name.endswith('.html'):
-                files.append(os.path.join('blog', entry.name))
-                
-    return files
+page_anchors = {} # file_path -> set of ids / names, filled from the page facts before evaluation
+link_status_cache = {} # url -> LinkStatus
+pending_link_checks = [] # (source_page, url), checked concurrently after all pages are merged
+
+def scan_tree(root_dir, skip_dir=None):
+    """
+    Depth-first os.scandir walk yielding (rel_path, is_dir) as entries are
+    read. Only the directories still to visit are held in memory, so deep
+    trees stream without building file lists. INDEX_SKIP_DIRS and directories
+    for which skip_dir(rel_path) is true are not entered.
+    """
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        try:
+            with os.scandir(os.path.join(root_dir, rel_dir) if rel_dir else root_dir) as entries:
+                for entry in entries:
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name in INDEX_SKIP_DIRS or (skip_dir and skip_dir(rel_path)):
+                            continue
+                        pending.append(rel_path)
+                        yield rel_path, True
+                    else:
+                        yield rel_path, False
+        except OSError as e:
+            print_warning(f"[提示] 无法读取目录 {rel_dir or root_dir}: {e}")
+
+@functools.lru_cache(maxsize=None)
+def _ignore_patterns(patterns):
+    """Compiles SCAN_IGNORE into one regex for directories and one for files."""
+    dirs = [fnmatch.translate(p.rstrip("/")) for p in patterns if p.endswith("/")]
+    files = [fnmatch.translate(p) for p in patterns if not p.endswith("/")]
+    never = "(?!)"
+    return re.compile("|".join(dirs) or never), re.compile("|".join(files) or never)
+
+def is_ignored(rel_path, is_dir=False):
+    """True if rel_path (or its basename) matches SCAN_IGNORE, or is in SKIP_FILES."""
+    dir_re, file_re = _ignore_patterns(tuple(SCAN_IGNORE))
+    pattern = dir_re if is_dir else file_re
+    name = rel_path.rsplit("/", 1)[-1]
+    return bool(pattern.match(rel_path) or pattern.match(name)) or (not is_dir and rel_path in SKIP_FILES)
+
+def iter_html_files(root_dir):
+    """Yields every auditable .html page under root_dir (recursively) as it is found."""
+    for rel_path, is_dir in scan_tree(root_dir, skip_dir=lambda d: is_ignored(d, True)):
+        if not is_dir and rel_path.endswith(".html") and not is_ignored(rel_path):
+            yield rel_path
 
 def normalize_path(path):
     return path.replace("\\", "/")
 
+class SiteIndex:
+    """
+    In-memory index of the site tree, scanned once per run. Link and sitemap
+    URL resolution goes through it instead of per-link stat calls; resolved
+    targets are memoized.
+    """
+    def __init__(self, root_dir):
+        self.files = set()
+        self.dirs = {"."}
+        for rel_path, is_dir in scan_tree(root_dir):
+            (self.dirs if is_dir else self.files).add(rel_path)
+        self._targets = {}
+
+    @staticmethod
+    def _join(directory, name):
+        return name if directory == "." else f"{directory}/{name}"
+
+    @staticmethod
+    def _key(path):
+        return normalize_path(os.path.normpath(path))
+
+    def exists(self, path):
+        key = self._key(path)
+        return key in self.files or key in self.dirs
+
+    def resolve_target(self, path):
+        """
+        Maps a normalised link target to the file that serves it: the file
+        itself, <dir>/index.html, or the clean-URL alias <path>.html.
+        Returns None when nothing serves it (404).
+        """
+        if path in self._targets:
+            return self._targets[path]
+        key = self._key(path)
+        found = None
+        if key in self.files:
+            found = key
+        elif key in self.dirs:
+            index = self._join(key, "index.html")
+            if index in self.files:
+                found = index
+        elif not key.endswith(".html") and key + ".html" in self.files:
+            found = key + ".html"
+        self._targets[path] = found
+        return found
+
+# Set by main()
+site_index = None
+site_redirects = None # compiled _redirects (redirects.Redirects)
+
+@functools.lru_cache(maxsize=None)
 def resolve_link(source_file, link):
     if link.startswith("http") or link.startswith("//"):
         return None
@@ -114,40 +293,484 @@ def resolve_link(source_file, link):
     target_path = os.path.normpath(target_path)
     return normalize_path(target_path)
 
+@dataclass
+class LinkStatus:
+    status: int = None # status of the first response (None = request failed)
+    location: str = None # Location of the first redirect hop
+    chain: list = field(default_factory=list) # [(url, status), ...] up to the final response
+    error: str = None
+    etag: str = None # ETag of the final response, used for conditional revalidation
+    checked_at: float = None
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+HEAD_REJECTED_STATUSES = (403, 405, 501) # 部分服务器不支持 HEAD，退回 GET
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+async def _aiohttp_fetch(session, method, url, timeout, headers):
+    async with session.request(method, url, headers=headers, allow_redirects=False, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        return resp.status, resp.headers.get("Location"), resp.headers.get("ETag")
+
+def _requests_fetch(session, method, url, timeout, headers):
+    resp = session.request(method, url, headers=headers, allow_redirects=False, timeout=timeout, stream=(method == "GET"))
+    resp.close()
+    return resp.status_code, resp.headers.get("Location"), resp.headers.get("ETag")
+
+def is_transient_error(error):
+    """
+    True for failures worth retrying: timeouts and dropped / reset connections
+    (also when wrapped by requests / urllib3). DNS errors, refused connections,
+    SSL errors and invalid URLs fail immediately.
+    """
+    for _ in range(5):
+        if error is None:
+            return False
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionResetError, ConnectionAbortedError)):
+            return True
+        if HAS_AIOHTTP and isinstance(error, aiohttp.ServerDisconnectedError):
+            return True
+        if HAS_REQUESTS and isinstance(error, requests.Timeout):
+            return True
+        wrapped = next((arg for arg in error.args if isinstance(arg, BaseException)), None)
+        error = wrapped or error.__cause__ or error.__context__
+    return False
+
+class LinkChecker:
+    """
+    Concurrent link checker on asyncio with a pooled HTTP client.
+    Uses aiohttp when installed, otherwise a requests.Session driven from
+    worker threads. Global and per-host concurrency are bounded by semaphores.
+    """
+    def __init__(self, concurrency=LINK_CHECK_CONCURRENCY, per_host=LINK_CHECK_PER_HOST,
+                 timeout=LINK_CHECK_TIMEOUT, retries=LINK_CHECK_RETRIES,
+                 backoff=LINK_CHECK_BACKOFF, max_redirects=MAX_REDIRECT_HOPS):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_redirects = max_redirects
+        self._host_limits = {}
+
+    def _host_limit(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def _request(self, method, url, headers=None):
+        """
+        One request with exponential backoff; only RETRY_STATUSES and transient
+        errors (is_transient_error) are retried. Returns (status, location, etag).
+        """
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+            try:
+                async with self._host_limit(url), self._global_limit:
+                    status, location, etag = await self._fetch(method, url, headers)
+                if status in RETRY_STATUSES and attempt < self.retries:
+                    continue
+                return status, location, etag
+            except Exception as e:
+                if not is_transient_error(e):
+                    raise
+                last_error = e
+        raise last_error
+
+    async def revalidate(self, url, cached):
+        """Conditional HEAD for a cached direct 2xx with an ETag. Returns the refreshed entry on 304, else None."""
+        try:
+            status, _, _ = await self._request("HEAD", url, {"If-None-Match": cached.etag})
+        except Exception:
+            return None
+        if status != 304:
+            return None
+        cached.checked_at = time.time()
+        self.revalidated += 1
+        return cached
+
+    async def check(self, url, cached=None):
+        """Follows the redirect chain of url (HEAD, GET fallback) up to max_redirects hops."""
+        if cached is not None and cached.etag and len(cached.chain) == 1 and 200 <= (cached.status or 0) < 300:
+            refreshed = await self.revalidate(url, cached)
+            if refreshed is not None:
+                return refreshed
+        result = LinkStatus()
+        current = url
+        seen = set()
+        try:
+            for _ in range(self.max_redirects + 1):
+                status, location, etag = await self._request("HEAD", current)
+                if status in HEAD_REJECTED_STATUSES:
+                    status, location, etag = await self._request("GET", current)
+                result.chain.append((current, status))
+                result.etag = etag
+                if result.status is None:
+                    result.status, result.location = status, location
+                if status not in REDIRECT_STATUSES or not location:
+                    break
+                seen.add(current)
+                current = urllib.parse.urljoin(current, location)
+                if current in seen:
+                    result.error = "redirect loop"
+                    result.chain.append((current, None))
+                    break
+            else:
+                result.error = f"超过 {self.max_redirects} 次跳转"
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+        result.checked_at = time.time()
+        return result
+
+    async def check_all(self, urls, cached=None):
+        """Checks every url concurrently (revalidating stale `cached` entries when possible). Returns {url: LinkStatus}."""
+        urls = list(dict.fromkeys(urls))
+        cached = cached or {}
+        self._global_limit = asyncio.Semaphore(self.concurrency)
+        self._host_limits = {}
+        self.revalidated = 0
+        if HAS_AIOHTTP:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                self._fetch = lambda method, url, headers: _aiohttp_fetch(session, method, url, self.timeout, headers)
+                results = await asyncio.gather(*(self.check(u, cached.get(u)) for u in urls))
+        else:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.per_host)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            try:
+                self._fetch = lambda method, url, headers: asyncio.to_thread(_requests_fetch, session, method, url, self.timeout, headers)
+                results = await asyncio.gather(*(self.check(u, cached.get(u)) for u in urls))
+            finally:
+                session.close()
+        return dict(zip(urls, results))
+
+class LinkStatusStore:
+    """
+    Persistent link-status cache (SQLite): url -> status, location, redirect
+    chain, ETag and checked_at. Entries expire per status class (LINK_CACHE_TTL);
+    expired entries with an ETag are revalidated with If-None-Match.
+    """
+    def __init__(self, path=LINK_CACHE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS link_status (
+                url TEXT PRIMARY KEY,
+                status INTEGER,
+                location TEXT,
+                chain TEXT,
+                error TEXT,
+                etag TEXT,
+                checked_at REAL
+            )""")
+
+    @staticmethod
+    def ttl_for(entry):
+        if entry.error or entry.status is None:
+            return LINK_CACHE_TTL["error"]
+        if entry.status in REDIRECT_STATUSES:
+            return LINK_CACHE_TTL["redirect"]
+        if 200 <= entry.status < 300:
+            return LINK_CACHE_TTL["ok"]
+        if 400 <= entry.status < 500:
+            return LINK_CACHE_TTL["client_error"]
+        return LINK_CACHE_TTL["error"]
+
+    def is_fresh(self, entry, now=None):
+        return (now or time.time()) - (entry.checked_at or 0) < self.ttl_for(entry)
+
+    def _row_to_status(self, row):
+        url, status, location, chain, error, etag, checked_at = row
+        return LinkStatus(status, location, [tuple(hop) for hop in json.loads(chain or "[]")], error, etag, checked_at)
+
+    def get_many(self, urls):
+        found = {}
+        urls = list(urls)
+        for i in range(0, len(urls), 500):
+            batch = urls[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT url, status, location, chain, error, etag, checked_at FROM link_status WHERE url IN ({','.join('?' * len(batch))})",
+                batch)
+            for row in rows:
+                found[row[0]] = self._row_to_status(row)
+        return found
+
+    def put_many(self, statuses):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO link_status VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(url, st.status, st.location, json.dumps(st.chain), st.error, st.etag, st.checked_at) for url, st in statuses.items()])
+
+    def all(self):
+        rows = self.db.execute("SELECT url, status, location, chain, error, etag, checked_at FROM link_status ORDER BY checked_at DESC")
+        return [(row[0], self._row_to_status(row)) for row in rows]
+
+    def clear(self):
+        with self.db:
+            count = self.db.execute("DELETE FROM link_status").rowcount
+        return count
+
+    def close(self):
+        self.db.close()
+
+# Set by main(); None = in-memory cache only
+link_status_store = None
+
+def check_links(urls, **options):
+    """
+    Synchronous entry point: returns {url: LinkStatus}. Answers from the
+    in-memory cache, then from fresh entries of the persistent store, and
+    only checks (or revalidates) the rest over the network.
+    """
+    if not (HAS_AIOHTTP or HAS_REQUESTS):
+        return {}
+    pending = [u for u in dict.fromkeys(urls) if u not in link_status_cache]
+    stale = {}
+    if pending and link_status_store is not None:
+        now = time.time()
+        for url, entry in link_status_store.get_many(pending).items():
+            if link_status_store.is_fresh(entry, now):
+                link_status_cache[url] = entry
+            else:
+                stale[url] = entry
+        pending = [u for u in pending if u not in link_status_cache]
+    if pending:
+        checker = LinkChecker(**options)
+        results = asyncio.run(checker.check_all(pending, stale))
+        link_status_cache.update(results)
+        stats["link_requests"] += len(pending)
+        stats["link_revalidated"] += checker.revalidated
+        if link_status_store is not None:
+            link_status_store.put_many(results)
+    return {u: link_status_cache[u] for u in urls if u in link_status_cache}
+
 def inspect_link(url):
     """
-    Check the status code of a link. Returns (status_code, final_url).
+    Check the status code of a link. Returns (status_code, location).
     """
-    if not HAS_REQUESTS:
+    status = check_links([url]).get(url)
+    if status is None:
         return (None, None)
-        
-    if url in link_status_cache:
-        return link_status_cache[url]
-        
+    return (status.status, status.location)
+
+def format_redirect_chain(status):
+    hops = [url for url, _ in status.chain]
+    final = status.chain[-1][1] if status.chain else None
+    chain = " -> ".join(hops)
+    if status.error:
+        return f"{chain} ({status.error})"
+    return f"{chain} (最终 {final})"
+
+def check_redirects(statuses=None):
+    """
+    Runs the network checks collected from all pages and records redirect
+    issues in page order. With statuses ({url: LinkStatus}) given, only those
+    are used and nothing is fetched.
+    """
+    if statuses is None:
+        statuses = check_links([href for _, href in pending_link_checks])
+    for source, href in pending_link_checks:
+        status = statuses.get(href)
+        if status is None:
+            continue
+        hops = len(status.chain) - 1
+        if status.status in [301, 308]:
+            redirect_issues.append(f"[{source}] 301 永久重定向 ({hops} 跳): {format_redirect_chain(status)} (建议直接链接到目标)")
+        elif status.status in [302, 303, 307]:
+            redirect_issues.append(f"[{source}] 302 临时重定向 ({hops} 跳): {format_redirect_chain(status)} (可能造成权重流失)")
+
+@dataclass
+class CrawlResult:
+    url: str
+    status: int = None
+    final_url: str = None
+    hops: int = 0 # redirects followed
+    known_target: bool = False # redirect points at a URL already crawled / queued; not followed further
+    ttfb: float = None # seconds from first request to the final response headers
+    total: float = None # seconds until the final body is fully received
+    size: int = 0 # bytes on the wire (body before decompression)
+    content_type: str = None
+    encoding: str = None
+    cache_control: str = None
+    etag: str = None
+    last_modified: str = None
+    error: str = None
+    links: list = field(default_factory=list)
+
+    def is_html(self):
+        return (self.content_type or "").startswith("text/html")
+
+    def is_uncompressed(self):
+        return (not self.encoding and self.size >= CRAWL_COMPRESS_MIN_BYTES
+                and (self.content_type or "").startswith(CRAWL_COMPRESSIBLE_TYPES))
+
+    def is_uncacheable(self):
+        cache_control = (self.cache_control or "").lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return True
+        # Without freshness or a validator the browser/CDN must refetch every time
+        return "max-age" not in cache_control and not self.etag and not self.last_modified
+
+    def is_slow(self):
+        return (self.ttfb or 0) > CRAWL_SLOW_TTFB or (self.total or 0) > CRAWL_SLOW_TOTAL
+
+class HrefCollector(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.hrefs.append(href.strip())
+
+async def _aiohttp_get(session, url, timeout):
+    started = time.perf_counter()
+    async with session.get(url, headers={"Accept-Encoding": CRAWL_ACCEPT_ENCODING}, allow_redirects=False,
+                           timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        ttfb = time.perf_counter() - started
+        body = await resp.read()
+        return resp.status, dict(resp.headers), body, ttfb
+
+def _requests_get(session, url, timeout):
+    started = time.perf_counter()
+    resp = session.get(url, headers={"Accept-Encoding": CRAWL_ACCEPT_ENCODING}, allow_redirects=False,
+                       timeout=timeout, stream=True)
+    ttfb = time.perf_counter() - started
     try:
-        # We use allow_redirects=False first to catch the redirect code
-        # But requests.head might follow if we don't set it.
-        # Actually, to check 'efficiency', we want to know if it redirects.
-        response = requests.head(url, allow_redirects=False, timeout=5)
-        status = response.status_code
-        
-        # If it is a redirect, get the target
-        location = None
-        if status in [301, 302, 307, 308]:
-             location = response.headers.get('Location')
-             # If relative redirect, make it absolute for display? (requests handles this usually if following)
-             
-        link_status_cache[url] = (status, location)
-        return (status, location)
-    except Exception as e:
-        # print(f"Request failed for {url}: {e}")
-        return (None, None)
+        body = resp.raw.read(decode_content=False)
+    finally:
+        resp.close()
+    return resp.status_code, dict(resp.headers), body, ttfb
 
-def check_redirect(url):
-    # Backward compatibility wrapper if needed, but we will use inspect_link directly
-    s, l = inspect_link(url)
-    if s == 302: return True
-    return False
+def decode_body(body, encoding):
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+class SiteCrawler:
+    """
+    Breadth-first crawl of a live site with the same async client stack as
+    LinkChecker (aiohttp, or requests.Session in worker threads). Bodies are
+    read undecoded so transfer size and Content-Encoding are what the CDN sends.
+    URLs are deduplicated after redirects too: a page reached through a
+    redirect is not crawled (or expanded) again under its final URL.
+    """
+    def __init__(self, base_url, concurrency=CRAWL_CONCURRENCY, max_pages=CRAWL_MAX_PAGES,
+                 timeout=CRAWL_TIMEOUT, max_redirects=MAX_REDIRECT_HOPS):
+        self.base_url = base_url
+        self.host = urllib.parse.urlsplit(base_url).netloc
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+
+    def normalize(self, href, page_url):
+        url = urllib.parse.urljoin(page_url, href)
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or parts.netloc != self.host:
+            return None
+        if any(parts.path.startswith(prefix) for prefix in IGNORE_PREFIXES):
+            return None
+        return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path or "/", parts.query, ""))
+
+    async def fetch(self, url, seen=()):
+        """Fetches url, following redirects unless they lead to a URL in seen (crawled there instead)."""
+        result = CrawlResult(url)
+        started = time.perf_counter()
+        current = url
+        try:
+            for _ in range(self.max_redirects + 1):
+                hop_started = time.perf_counter()
+                status, headers, body, hop_ttfb = await self._get(current)
+                location = headers.get("Location")
+                if status in REDIRECT_STATUSES and location:
+                    result.hops += 1
+                    current = urllib.parse.urljoin(current, location)
+                    if self.normalize(current, current) in seen:
+                        result.known_target = True
+                        break
+                    continue
+                break
+            else:
+                result.error = f"超过 {self.max_redirects} 次跳转"
+                return result
+            result.total = time.perf_counter() - started
+            result.ttfb = hop_started - started + hop_ttfb
+            result.status = status
+            result.final_url = current
+            result.size = len(body)
+            result.content_type = headers.get("Content-Type")
+            result.encoding = (headers.get("Content-Encoding") or "").strip().lower() or None
+            result.cache_control = headers.get("Cache-Control")
+            result.etag = headers.get("ETag")
+            result.last_modified = headers.get("Last-Modified")
+            if result.is_html() and status == 200:
+                collector = HrefCollector()
+                collector.feed(decode_body(body, result.encoding).decode("utf-8", errors="replace"))
+                collector.close()
+                result.links = collector.hrefs
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+        return result
+
+    async def _crawl(self):
+        queue = asyncio.Queue()
+        seen = {self.base_url}
+        results = []
+        queue.put_nowait(self.base_url)
+
+        async def worker():
+            while True:
+                url = await queue.get()
+                try:
+                    result = await self.fetch(url, seen)
+                    results.append(result)
+                    final = self.normalize(result.final_url, url) if result.final_url else None
+                    if final and final != url:
+                        if final in seen:
+                            continue # redirect target already crawled or queued under its own URL
+                        seen.add(final)
+                    for href in result.links:
+                        link = self.normalize(href, result.final_url or url)
+                        if link and link not in seen and len(seen) < self.max_pages:
+                            seen.add(link)
+                            queue.put_nowait(link)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        await queue.join()
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        return sorted(results, key=lambda r: r.url)
+
+    async def run(self):
+        if HAS_AIOHTTP:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            async with aiohttp.ClientSession(connector=connector, auto_decompress=False) as session:
+                self._get = lambda url: _aiohttp_get(session, url, self.timeout)
+                return await self._crawl()
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        try:
+            self._get = lambda url: asyncio.to_thread(_requests_get, session, url, self.timeout)
+            return await self._crawl()
+        finally:
+            session.close()
 
 def get_relative_url(full_url):
     if not full_url.startswith(SITE_URL):
@@ -167,11 +790,62 @@ def get_relative_url(full_url):
     ]
     
     for c in candidates:
-        if os.path.exists(c):
+        if site_index.exists(c):
             return normalize_path(c)
             
     return None
 
+def canonical_url_key(url):
+    """
+    Comparison key for site URLs: ignores scheme, host case, query, fragment,
+    trailing slash and the .html / index.html suffix, so
+    https://x-grok.top/blog/ == http://X-GROK.top/blog/index.html.
+    """
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path
+    if path.endswith(".html"):
+        path = path[:-len(".html")]
+    if path == "index" or path.endswith("/index"):
+        path = path[:-len("index")]
+    return (parts.netloc.lower(), path.rstrip("/"))
+
+def page_url(file_path):
+    """Clean public URL of an HTML file."""
+    if file_path == "index.html":
+        return SITE_URL
+    if file_path.endswith("/index.html"):
+        return SITE_URL + "/" + os.path.dirname(file_path)
+    return SITE_URL + "/" + file_path.replace(".html", "")
+
+def load_sitemap_xml(xml_path):
+    """
+    Collects <loc> URLs from a urlset, or from every part listed in a
+    sitemap index (parts may be gzipped, see build.py SitemapWriter).
+    """
+    ns = {'sitemap': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
+    if xml_path.endswith(".gz"):
+        with gzip.open(xml_path, "rb") as f:
+            root = ET.fromstring(f.read())
+    else:
+        root = ET.parse(xml_path).getroot()
+
+    if root.tag.endswith("sitemapindex"):
+        for sm in root.findall('sitemap:sitemap', ns):
+            loc = sm.find('sitemap:loc', ns)
+            if loc is None or not loc.text:
+                continue
+            part_path = get_relative_url(loc.text.strip())
+            if part_path:
+                load_sitemap_xml(part_path)
+            else:
+                sitemap_warnings.append(f"[SITEMAP WARNING] Sitemap 索引指向不存在的分片: {loc.text.strip()}")
+        return
+
+    for url in root.findall('sitemap:url', ns):
+        loc = url.find('sitemap:loc', ns)
+        if loc is not None:
+            sitemap_xml_urls.add(loc.text.strip())
+
 def check_sitemaps():
     print(f"\n{Colors.BOLD}🗺️  Sitemap 一致性检查...{Colors.RESET}")
     
@@ -179,14 +853,7 @@ def check_sitemaps():
     xml_path = "sitemap.xml"
     if os.path.exists(xml_path):
         try:
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            # Handle namespace
-            ns = {'sitemap': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            for url in root.findall('sitemap:url', ns):
-                loc = url.find('sitemap:loc', ns)
-                if loc is not None:
-                    sitemap_xml_urls.add(loc.text.strip())
+            load_sitemap_xml(xml_path)
             print(f"  - sitemap.xml: 发现 {len(sitemap_xml_urls)} 个 URL")
         except Exception as e:
             sitemap_warnings.append(f"[sitemap.xml] 解析失败: {e}")
@@ -212,135 +879,598 @@ def check_sitemaps():
         except Exception as e:
             sitemap_warnings.append(f"[sitemap.html] 解析失败: {e}")
 
-    # 3. Cross Check
-    # Check XML -> File
+    # 3. Cross Check (both sides reduced to canonical URL keys, compared as sets)
+    xml_keys = {}
     for url in sitemap_xml_urls:
         if "/#" in url: continue # Skip anchor links
-        file_path = get_relative_url(url)
-        if not file_path:
+        xml_keys.setdefault(canonical_url_key(url), url)
+
+    file_keys = {canonical_url_key(page_url(f)): f for f in all_html_files}
+
+    # Check XML -> File
+    for key in sorted(xml_keys.keys() - file_keys.keys()):
+        url = xml_keys[key]
+        # Non-HTML resources listed in the sitemap still resolve through the site index
+        if not get_relative_url(url):
              sitemap_warnings.append(f"[SITEMAP WARNING] XML 中存在死链或外部链接: {url}")
 
     # Check File -> XML
-    for f in all_html_files:
+    for key in sorted(file_keys.keys() - xml_keys.keys()):
+        f = file_keys[key]
         if f in ["google_verification.html", "baidu_verification.html", "sitemap_template.html", "preview_card.html", "policies.html"] or f in SKIP_FILES: continue
-        
-        # Construct expected URL
-        if f == "index.html":
-            expected_url = SITE_URL
-        elif f.endswith("/index.html"):
-            expected_url = SITE_URL + "/" + os.path.dirname(f)
+        sitemap_warnings.append(f"[SITEMAP WARNING] 页面未被 sitemap.xml 收录: {f}")
+
+@dataclass
+class PageFacts:
+    """
+    What the audit needs from one page's HTML, produced by the rule engine in
+    a single walk: page facts for the link graph plus the findings that
+    depend only on the content. Cached by content hash (PAGE_FACTS_FILE) and
+    only re-extracted when the page changes.
+    """
+    file_path: str
+    digest: str = None # sha1 of the file bytes
+    read_error: str = None
+    title: str = None
+    description: str = None
+    canonical: str = None
+    links: list = field(default_factory=list) # (href, rel list) for every non-empty <a href>; intern_links() turns it into page_links ids
+    errors: list = field(default_factory=list)
+    warnings: list = field(default_factory=list)
+    clean_url_issues: list = field(default_factory=list)
+    render: dict = field(default_factory=dict) # RenderCostRule metrics
+    anchors: list = field(default_factory=list) # ids and <a name> values, for #fragment links
+    rule_stats: dict = field(default_factory=dict) # rule -> [calls, findings, seconds], this run only
+
+    def finding_count(self):
+        return len(self.errors) + len(self.warnings) + len(self.clean_url_issues)
+
+@dataclass
+class PageResult:
+    """
+    Everything evaluate_page() finds on one page. Built without touching the
+    module-level report state and merged afterwards by merge_page_result().
+    """
+    file_path: str
+    errors: list = field(default_factory=list)
+    warnings: list = field(default_factory=list)
+    clean_url_issues: list = field(default_factory=list)
+    redirect_issues: list = field(default_factory=list) # internal links resolved through _redirects
+    soft_routes: list = field(default_factory=list) # /go/... hrefs
+    internal_targets: array = field(default_factory=lambda: array("I")) # link_graph.pages ids of the existing HTML pages this page links to
+    external_links: list = field(default_factory=list) # (href, is_unsafe)
+    network_checks: list = field(default_factory=list) # absolute internal URLs for check_links()
+    internal_links: int = 0
+    external_links_count: int = 0
+
+SOFT_ROUTE_REL = {"nofollow", "sponsored", "noopener", "noreferrer"}
+EXTERNAL_LINK_REL = {"nofollow", "noopener", "noreferrer"}
+
+def get_rel(el):
+    rel = el.get("rel", [])
+    if isinstance(rel, str):
+        rel = rel.split()
+    return list(rel)
+
+def is_internal_href(href):
+    return (not href.startswith("http") and not href.startswith("//")) or SITE_DOMAIN in href
+
+# --- Audit rules ---
+class AuditRule:
+    """
+    A page check. The parser backend walks each document once and visit() is
+    called for every element whose name is in `tags`, then finish() after the
+    walk. Rules only use el.name, el.get(), el.string and the walk context
+    (ctx.depth, ctx.in_head, ctx.in_noscript), so they work on BeautifulSoup
+    tags and on streamed elements alike.
+    Rules record facts and content-only findings on the PageFacts; a new
+    instance is created per page, so rules may keep per-page state.
+    Findings are cached per page, so config() must return (as JSON-safe
+    values) every setting that changes what the rule records.
+    """
+    name = "rule"
+    tags = () # element names to receive, "*" = every element
+    text_tags = () # tags whose el.string visit() reads (the streaming backend dispatches them at the end tag)
+
+    @classmethod
+    def config(cls):
+        return None
+
+    def visit(self, el, page, ctx):
+        pass
+
+    def finish(self, page, content):
+        pass
+
+class TitleRule(AuditRule):
+    name = "title"
+    tags = ("title",)
+    text_tags = ("title",)
+
+    def __init__(self):
+        self.seen = False
+
+    def visit(self, el, page, ctx):
+        if not self.seen:
+            self.seen = True
+            page.title = str(el.string) if el.string else None
+
+    def finish(self, page, content):
+        if not page.title or len(page.title.strip()) <= 5:
+            page.warnings.append(f"[{page.file_path}] [SEO WARNING] Thin Content: Title 缺失或过短 (<=5 chars)")
+
+class MetaDescriptionRule(AuditRule):
+    name = "meta-description"
+    tags = ("meta",)
+
+    def __init__(self):
+        self.seen = False
+
+    def visit(self, el, page, ctx):
+        if not self.seen and el.get("name") == "description":
+            self.seen = True
+            page.description = el.get("content")
+
+    def finish(self, page, content):
+        if not page.description or len(page.description.strip()) <= 100:
+            page.warnings.append(f"[{page.file_path}] [SEO WARNING] Thin Content: Description 缺失或过短 (<=100 chars)")
+
+class CanonicalRule(AuditRule):
+    name = "canonical"
+    tags = ("link",)
+
+    def __init__(self):
+        self.seen = False
+
+    def visit(self, el, page, ctx):
+        if not self.seen and "canonical" in get_rel(el):
+            self.seen = True
+            page.canonical = el.get("href")
+
+    def finish(self, page, content):
+        c_href = page.canonical
+        if not c_href:
+            return
+        file_path = page.file_path
+        # Expected Clean URL
+        if file_path == "index.html":
+            expected_path = "" # root
+        elif file_path.endswith("/index.html"):
+            # Directory index should ideally have a trailing slash
+            expected_path = "/" + os.path.dirname(file_path) + "/"
         else:
-            expected_url = SITE_URL + "/" + f.replace(".html", "")
-            
-        # Try to find a match (allowing for slight variations like trailing slash)
-        found = False
-        for xml_url in sitemap_xml_urls:
-            # Check both with and without trailing slash, and exact match
-            check_urls = [
-                expected_url,
-                expected_url.rstrip("/"),
-                expected_url + "/"
-            ]
-            if any(xml_url.rstrip("/") == u.rstrip("/") for u in check_urls):
-                found = True
-                break
-        
-        if not found:
-             sitemap_warnings.append(f"[SITEMAP WARNING] 页面未被 sitemap.xml 收录: {f}")
+            expected_path = "/" + file_path.replace(".html", "")
+        expected_path = expected_path.replace("\\", "/")
 
-def audit_file(file_path):
-    stats["pages_scanned"] += 1
-    
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-    except Exception as e:
-        errors.append(f"[{file_path}] 无法读取文件: {str(e)}")
-        return
+        if not c_href.endswith(expected_path) and not (expected_path == "" and c_href == SITE_URL):
+            page.warnings.append(f"[{file_path}] [SEO WARNING] Canonical Mismatch: {c_href} (应指向 {expected_path})")
+        if c_href.endswith(".html"):
+            page.warnings.append(f"[{file_path}] [SEO WARNING] Canonical 包含 .html 后缀: {c_href}")
 
-    soup = BeautifulSoup(content, "html.parser")
-    
-    # --- Meta Check ---
-    title = soup.find("title")
-    if not title or not title.string or len(title.string.strip()) <= 5:
-        warnings.append(f"[{file_path}] [SEO WARNING] Thin Content: Title 缺失或过短 (<=5 chars)")
-        
-    desc = soup.find("meta", attrs={"name": "description"})
-    if not desc or not desc.get("content") or len(desc.get("content").strip()) <= 100:
-         warnings.append(f"[{file_path}] [SEO WARNING] Thin Content: Description 缺失或过短 (<=100 chars)")
-
-    # --- Canonical Check ---
-    canonical = soup.find("link", attrs={"rel": "canonical"})
-    if canonical:
-        c_href = canonical.get("href")
-        if c_href:
-            # Expected Clean URL
-            if file_path == "index.html":
-                expected_path = "" # root
-            elif file_path.endswith("/index.html"):
-                # Directory index should ideally have a trailing slash
-                expected_path = "/" + os.path.dirname(file_path) + "/"
-            else:
-                expected_path = "/" + file_path.replace(".html", "")
-            
-            expected_path = expected_path.replace("\\", "/")
-            
-            if not c_href.endswith(expected_path) and not (expected_path == "" and c_href == SITE_URL):
-                 warnings.append(f"[{file_path}] [SEO WARNING] Canonical Mismatch: {c_href} (应指向 {expected_path})")
-            
-            if c_href.endswith(".html"):
-                 warnings.append(f"[{file_path}] [SEO WARNING] Canonical 包含 .html 后缀: {c_href}")
+class AnchorRule(AuditRule):
+    """Empty links, sales-link and external rel, protocol and clean-URL checks; records links for the graph."""
+    name = "anchors"
+    tags = ("a",)
 
-    # 2. Deep Crawl
-    links = soup.find_all("a")
-    for a in links:
-        href = a.get("href")
-        
+    @classmethod
+    def config(cls):
+        return {"soft_route_rel": sorted(SOFT_ROUTE_REL), "external_link_rel": sorted(EXTERNAL_LINK_REL)}
+
+    def visit(self, el, page, ctx):
+        file_path = page.file_path
+        href = el.get("href")
         # Check Empty Links
-        if href is None or (href.strip() == "" and href != "#"):
-            if href is None or href.strip() == "":
-                 warnings.append(f"[{file_path}] 空链接: href 为空")
-                 continue
-        
+        if href is None or href.strip() == "":
+            page.warnings.append(f"[{file_path}] 空链接: href 为空")
+            return
         if href == "#":
-            warnings.append(f"[{file_path}] 空链接: href=\"#\"")
-            continue
+            page.warnings.append(f"[{file_path}] 空链接: href=\"#\"")
+            return
 
         href = href.strip()
+        rel = get_rel(el)
+        page.links.append((href, rel))
 
-        # Check Soft Routing / Sales Links
-        if href.startswith('/go/'):
-            soft_routing_map[href].append(file_path)
-            
-            rel = a.get("rel", [])
-            if isinstance(rel, str):
-                rel = rel.split()
-            
-            # Strict check for sales links
-            required_rel = {"nofollow", "sponsored", "noopener", "noreferrer"}
-            if not required_rel.issubset(set(rel)):
-                warnings.append(f"[{file_path}] 软路由/销售链接警告: {href} (缺少 rel=\"nofollow sponsored noopener noreferrer\")")
+        # Strict check for sales links
+        if href.startswith('/go/') and not SOFT_ROUTE_REL.issubset(rel):
+            page.warnings.append(f"[{file_path}] 软路由/销售链接警告: {href} (缺少 rel=\"nofollow sponsored noopener noreferrer\")")
 
         # Check Protocol
         if "http://x-grok.top" in href:
-             warnings.append(f"[{file_path}] 不安全协议: {href} (应使用 https)")
-        
-        # Internal vs External
-        is_internal = False
-        if not href.startswith("http") and not href.startswith("//"):
-            is_internal = True
-        elif SITE_DOMAIN in href:
-            is_internal = True
-        
-        if is_internal:
-            stats["internal_links"] += 1
-            
+            page.warnings.append(f"[{file_path}] 不安全协议: {href} (应使用 https)")
+
+        if is_internal_href(href):
             # Check Clean URL
             href_clean = href.split('#')[0].split('?')[0]
             if href_clean.endswith(".html") or "/index.html" in href:
-                 clean_url_issues.append(f"[{file_path}] 非 Clean URL: {href} (建议去除 .html)")
-                 # warnings.append(f"[{file_path}] 非 Clean URL: {href} (建议去除 .html)") # Clean URL issues moved to separate report
+                page.clean_url_issues.append(f"[{file_path}] 非 Clean URL: {href} (建议去除 .html)")
+        elif not EXTERNAL_LINK_REL.issubset(rel):
+            page.warnings.append(f"[{file_path}] 外链安全警告: {href} (缺少 rel=\"nofollow noopener noreferrer\")")
+
+class ConversionRule(AuditRule):
+    """Blog posts must carry the sidebar conversion card (matched on the raw HTML)."""
+    name = "conversion"
+
+    @classmethod
+    def config(cls):
+        return CONVERSION_KEYWORDS
+
+    def finish(self, page, content):
+        file_path = page.file_path
+        if file_path.startswith("blog/") and file_path != "blog/index.html":
+            if not any(kw in content for kw in CONVERSION_KEYWORDS):
+                page.errors.append(f"[{file_path}] 组件丢失: 未发现侧边栏推广卡片")
+
+class RenderCostRule(AuditRule):
+    """
+    Static front-end cost: render-blocking resources in <head>, images
+    without dimensions, below-the-fold images without lazy loading (first
+    FOLD_IMAGES images and <header> images load eagerly), inline
+    script/style bytes, DOM size and depth, and the likely LCP image (first
+    sizeable <img> in the body).
+    """
+    name = "render-cost"
+    tags = ("*",)
+    text_tags = ("script", "style")
+
+    @classmethod
+    def config(cls):
+        return {"inline_script_types": list(INLINE_SCRIPT_TYPES), "lcp_min_image_size": LCP_MIN_IMAGE_SIZE,
+                "fold_images": FOLD_IMAGES}
+
+    def __init__(self):
+        self.metrics = {
+            "blocking": [], "images": 0, "images_no_size": 0, "images_no_lazy": 0,
+            "inline_script_bytes": 0, "inline_style_bytes": 0,
+            "dom_nodes": 0, "dom_depth": 0, "lcp_image": None, "lcp_lazy": False,
+        }
+        self.content_images = 0 # <img> outside <header>, for the fold estimate
+
+    def visit(self, el, page, ctx):
+        m = self.metrics
+        m["dom_nodes"] += 1
+        m["dom_depth"] = max(m["dom_depth"], ctx.depth)
+        if ctx.in_noscript:
+            return
+        name = el.name
+        if name == "script":
+            if el.get("src") is not None:
+                if ctx.in_head and el.get("async") is None and el.get("defer") is None and el.get("type") != "module":
+                    m["blocking"].append(el.get("src"))
+            elif (el.get("type") or "text/javascript") in INLINE_SCRIPT_TYPES:
+                m["inline_script_bytes"] += len((el.string or "").encode("utf-8"))
+        elif name == "style":
+            m["inline_style_bytes"] += len((el.string or "").encode("utf-8"))
+        elif name == "link":
+            if ctx.in_head and "stylesheet" in get_rel(el) and el.get("media", "all") not in ("print", "none") \
+                    and el.get("disabled") is None:
+                m["blocking"].append(el.get("href"))
+        elif name == "img":
+            m["images"] += 1
+            if el.get("width") is None or el.get("height") is None:
+                m["images_no_size"] += 1
+            lazy = (el.get("loading") or "").lower() == "lazy"
+            if ctx.open_tags["header"] > 0:
+                above_fold = True
+            else:
+                self.content_images += 1
+                above_fold = self.content_images <= FOLD_IMAGES
+            if m["lcp_image"] is None and not ctx.in_head and self._is_sizeable(el):
+                m["lcp_image"] = el.get("src")
+                m["lcp_lazy"] = lazy
+            elif not lazy and not above_fold:
+                m["images_no_lazy"] += 1
+
+    @staticmethod
+    def _is_sizeable(el):
+        for attr in ("width", "height"):
+            value = (el.get(attr) or "").strip().rstrip("px")
+            if value.isdigit() and int(value) < LCP_MIN_IMAGE_SIZE:
+                return False
+        return True
+
+    def finish(self, page, content):
+        page.render = self.metrics
+
+class IdIndexRule(AuditRule):
+    """Collects every id (and <a name>) on the page, for fragment link checks."""
+    name = "id-index"
+    tags = ("*",)
+
+    def __init__(self):
+        self.anchors = set()
+
+    def visit(self, el, page, ctx):
+        anchor_id = el.get("id")
+        if anchor_id:
+            self.anchors.add(anchor_id)
+        if el.name == "a" and el.get("name"):
+            self.anchors.add(el.get("name"))
+
+    def finish(self, page, content):
+        page.anchors = sorted(self.anchors)
+
+# Registered rules, in report order. Adding a rule here does not add a tree walk.
+AUDIT_RULES = [TitleRule, MetaDescriptionRule, CanonicalRule, AnchorRule, ConversionRule, RenderCostRule, IdIndexRule]
+
+class RuleRunner:
+    """
+    Dispatches element events to the rules registered for their tag ("*" =
+    every element); times and counts every call. Backends report element
+    open/close so rules can read the walk context: depth, in_head, in_noscript.
+    """
+    def __init__(self, page):
+        self.page = page
+        self.rules = [rule_cls() for rule_cls in AUDIT_RULES]
+        self.by_tag = defaultdict(list)
+        for rule in self.rules:
+            for tag in rule.tags:
+                self.by_tag[tag].append(rule)
+        self.wildcard = self.by_tag.pop("*", [])
+        self.text_tags = {tag for rule in self.rules for tag in rule.text_tags}
+        self.timings = {rule.name: [0, 0, 0.0] for rule in self.rules}
+        self.depth = 0
+        self.open_tags = defaultdict(int)
+
+    @property
+    def in_head(self):
+        return self.open_tags["head"] > 0
+
+    @property
+    def in_noscript(self):
+        return self.open_tags["noscript"] > 0
+
+    def wants(self, tag):
+        return bool(self.wildcard) or tag in self.by_tag
+
+    def open(self, tag):
+        self.depth += 1
+        self.open_tags[tag] += 1
+
+    def close(self, tag):
+        self.depth -= 1
+        self.open_tags[tag] -= 1
+
+    def _call(self, rule, method, *args):
+        before = self.page.finding_count()
+        started = time.perf_counter()
+        method(*args)
+        entry = self.timings[rule.name]
+        entry[0] += 1
+        entry[1] += self.page.finding_count() - before
+        entry[2] += time.perf_counter() - started
+
+    def element(self, el):
+        for rule in self.by_tag.get(el.name, ()):
+            self._call(rule, rule.visit, el, self.page, self)
+        for rule in self.wildcard:
+            self._call(rule, rule.visit, el, self.page, self)
+
+    def finish(self, content):
+        """Runs every rule's finish(); returns the total time spent in rules."""
+        for rule in self.rules:
+            self._call(rule, rule.finish, self.page, content)
+        self.page.rule_stats.update(self.timings)
+        return sum(seconds for _, _, seconds in self.timings.values())
+
+# --- Parser backends ---
+# "html.parser" / "lxml" build a BeautifulSoup tree and walk it once;
+# "stream" feeds tag events straight from html.parser.HTMLParser without a tree.
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+                 "param", "source", "track", "wbr"}
+
+class StreamElement:
+    """Element seen by rules under the streaming backend: name, attributes and (for text tags) its text."""
+    __slots__ = ("name", "attrs", "string")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.string = None
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+class RuleEventParser(HTMLParser):
+    """
+    Tokenizer feeding a RuleRunner. Keeps a stack of open tags for depth and
+    context (end tags close back to the matching open tag, like the
+    BeautifulSoup html.parser builder). Text tags (<title>, <script>, ...) are
+    dispatched at their end tag so el.string is available.
+    """
+    def __init__(self, runner):
+        super().__init__(convert_charrefs=True)
+        self.runner = runner
+        self.stack = []
+        self.pending = None
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        runner = self.runner
+        runner.open(tag)
+        if runner.wants(tag):
+            # Valueless attributes read as "" like in BeautifulSoup
+            el = StreamElement(tag, {k: ("" if v is None else v) for k, v in attrs})
+            if tag in runner.text_tags and self.pending is None and tag not in VOID_ELEMENTS:
+                self.pending = el
+                self.text = []
+            else:
+                runner.element(el)
+        if tag in VOID_ELEMENTS:
+            runner.close(tag)
+        else:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_data(self, data):
+        if self.pending is not None:
+            self.text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag not in self.stack:
+            return
+        while self.stack:
+            open_tag = self.stack.pop()
+            if self.pending is not None and open_tag == self.pending.name:
+                self._flush()
+            self.runner.close(open_tag)
+            if open_tag == tag:
+                break
+
+    def _flush(self):
+        el, self.pending = self.pending, None
+        el.string = "".join(self.text) or None
+        self.runner.element(el)
+
+    def close(self):
+        super().close()
+        if self.stack:
+            self.handle_endtag(self.stack[0])
+        if self.pending is not None:
+            self._flush()
+
+def walk_tree(content, runner, parser):
+    soup = BeautifulSoup(content, parser)
+    stack = [(soup, iter(soup.children))]
+    while stack:
+        node, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if node is not soup:
+                runner.close(node.name)
+            continue
+        if child.name is None:
+            continue # text, comments
+        runner.open(child.name)
+        runner.element(child)
+        stack.append((child, iter(child.children)))
+
+def walk_stream(content, runner):
+    tokenizer = RuleEventParser(runner)
+    tokenizer.feed(content)
+    tokenizer.close()
+
+def resolve_parser(name):
+    if name == "auto":
+        # stream: fastest backend, findings verified identical to html.parser. lxml
+        # repairs the tree (implied html/body, misplaced head elements), which
+        # changes the DOM metrics; it is only used when asked for explicitly.
+        return "stream"
+    if name == "lxml" and not HAS_LXML:
+        print_warning("[提示] 未检测到 lxml 库，改用 stream 解析。")
+        return "stream"
+    return name
+
+def file_digest(file_path):
+    try:
+        with open(file_path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def extract_page_facts(file_path, parser="html.parser"):
+    facts = PageFacts(file_path)
+    try:
+        with open(file_path, "rb") as f:
+            raw = f.read()
+        content = raw.decode("utf-8")
+    except Exception as e:
+        facts.read_error = str(e)
+        return facts
+    facts.digest = hashlib.sha1(raw).hexdigest()
+
+    started = time.perf_counter()
+    runner = RuleRunner(facts)
+    if parser == "stream":
+        walk_stream(content, runner)
+    else:
+        walk_tree(content, runner, parser)
+    rules_seconds = runner.finish(content)
+    facts.rule_stats["(parse)"] = [1, 0, time.perf_counter() - started - rules_seconds]
+    return facts
+
+def check_fragment(result, href, anchors):
+    """Reports href's #fragment if the target page (anchors = its id/name set, None = unknown) lacks it."""
+    if anchors is None or "#" not in href:
+        return
+    fragment = urllib.parse.unquote(href.split("#", 1)[1])
+    if not fragment or fragment in IMPLICIT_FRAGMENTS or fragment.startswith(":~:"): # :~:text= text fragments
+        return
+    if fragment not in anchors:
+        result.warnings.append(f"[{result.file_path}] 锚点失效: {href} (目标页面不存在 id/name=\"{fragment}\")")
+
+def link_url_path(source_file, href):
+    """Site-absolute URL path ("/blog/x") an internal href requests, for _redirects matching."""
+    url = urllib.parse.urlsplit(urllib.parse.urljoin(f"{SITE_URL}/{source_file}", href))
+    if url.scheme not in ("http", "https"):
+        return None # mailto:, tel:, javascript:
+    return url.path or "/"
+
+def check_redirect_link(result, href, is_soft_route):
+    """
+    Resolves href through the compiled _redirects rules. Returns False when
+    no rule applies (the link is checked as a plain file); otherwise records
+    loops, chains, redirected internal links and dead final targets.
+    """
+    path = link_url_path(result.file_path, href)
+    resolution = site_redirects.resolve(path) if site_redirects and path else None
+    if resolution is None or not resolution.hops:
+        if is_soft_route:
+            result.errors.append(f"[{result.file_path}] 软路由无效: {href} (_redirects 中无匹配规则)")
+            return True
+        return False
+    file_path = result.file_path
+    if resolution.loop:
+        result.errors.append(f"[{file_path}] 重定向循环: {resolution.chain()}")
+        return True
+    redirects = resolution.redirects
+    if is_soft_route:
+        if len(redirects) > 1:
+            result.redirect_issues.append(f"[{file_path}] 软路由重定向链 ({len(redirects)} 跳): {resolution.chain()} (建议直接指向最终地址)")
+    elif redirects:
+        status = redirects[0].status
+        hint = "建议直接链接到目标" if status in (301, 308) else "可能造成权重流失"
+        result.redirect_issues.append(f"[{file_path}] {status} 站内重定向 ({len(redirects)} 跳, _redirects): {resolution.chain()} ({hint})")
+    if resolution.external:
+        return True
+    target = site_index.resolve_target(normalize_path(os.path.normpath(resolution.final.lstrip("/") or ".")))
+    if target is None:
+        result.errors.append(f"[{file_path}] 404 死链: {href} (经 _redirects 指向 {resolution.final}, 目标不存在)")
+    elif target in all_html_files:
+        result.internal_targets.append(link_graph.pages.intern(target))
+    return True
+
+def evaluate_page(facts):
+    """Resolves the page's links against the current site tree (no HTML parsing) on top of the cached findings."""
+    file_path = facts.file_path
+    result = PageResult(file_path, list(facts.errors), list(facts.warnings), list(facts.clean_url_issues))
+    if facts.read_error is not None:
+        result.errors.append(f"[{file_path}] 无法读取文件: {facts.read_error}")
+        return result
+
+    own_anchors = set(facts.anchors)
+    for href, rel in map(page_links.names.__getitem__, facts.links):
+        is_soft_route = href.startswith('/go/')
+        if is_soft_route:
+            result.soft_routes.append(href)
+
+        if is_internal_href(href):
+            result.internal_links += 1
             
+            # Same-page fragment (#section)
+            if href.startswith("#"):
+                check_fragment(result, href, own_anchors)
+                continue
+
+            # _redirects rules apply before static files (soft routes are always redirects)
+            if check_redirect_link(result, href, is_soft_route):
+                continue
+
             # 404 Check & Inbound Link Tracking
             target_file = resolve_link(file_path, href)
             
@@ -348,107 +1478,1044 @@ def audit_file(file_path):
                 continue
                 
             if target_file:
-                # Handle directory resolution
-                check_path = target_file
-                
-                # If path exists as file
-                found = False
-                if os.path.exists(check_path) and os.path.isfile(check_path):
-                    found = True
-                # If path exists as dir, look for index.html
-                elif os.path.exists(check_path) and os.path.isdir(check_path):
-                    if os.path.exists(os.path.join(check_path, "index.html")):
-                        check_path = os.path.join(check_path, "index.html")
-                        found = True
-                # If path doesn't exist, maybe it's a clean URL (e.g. /about -> /about.html)
-                elif not check_path.endswith(".html"):
-                    if os.path.exists(check_path + ".html"):
-                        check_path = check_path + ".html"
-                        found = True
-                
-                if found:
-                    # 修复：先标准化路径，去掉多余的 ./ 前缀
-                    check_path = os.path.normpath(check_path)
-                    check_path = normalize_path(check_path)
-                    
+                # File, directory index or clean URL (e.g. /about -> /about.html)
+                check_path = site_index.resolve_target(target_file)
+                if check_path:
                     if check_path in all_html_files:
-                        linked_pages.add(check_path)
-                        # Record inbound link
-                        inbound_links[check_path].append(file_path)
+                        result.internal_targets.append(link_graph.pages.intern(check_path))
+                    check_fragment(result, href, page_anchors.get(check_path))
                 else:
-                    errors.append(f"[{file_path}] 404 死链: {href} (目标不存在)")
+                    result.errors.append(f"[{file_path}] 404 死链: {href} (目标不存在)")
+            elif "#" in href:
+                # Absolute internal URL with a fragment
+                rel_path = get_relative_url(href.split("#")[0].split("?")[0])
+                if rel_path:
+                    check_fragment(result, href, page_anchors.get(site_index.resolve_target(rel_path)))
                     
             # Redirect & Link Efficiency Check
-            # Only perform network check if it's an absolute internal URL
-            if HAS_REQUESTS and href.startswith("http"):
-                 status, loc = inspect_link(href)
-                 if status in [301, 308]:
-                     redirect_issues.append(f"[{file_path}] 301 永久重定向: {href} -> {loc} (建议直接链接到目标)")
-                 elif status in [302, 307]:
-                     redirect_issues.append(f"[{file_path}] 302 临时重定向: {href} -> {loc} (可能造成权重流失)")
-                 elif status == 404:
-                     # Already caught by static check usually, but good to confirm
-                     pass
+            # Only perform network check if it's an absolute internal URL (done after merge, see merge_page_result)
+            if href.startswith("http"):
+                 result.network_checks.append(href)
 
         else:
-            stats["external_links"] += 1
-            # Record external link
-            external_links_map[href].append(file_path)
-            
-            # Check rel attribute for external links
-            rel = a.get("rel", [])
-            if isinstance(rel, str):
-                rel = rel.split()
-            
-            required_rel = {"nofollow", "noopener", "noreferrer"}
-            if not required_rel.issubset(set(rel)):
-                warnings.append(f"[{file_path}] 外链安全警告: {href} (缺少 rel=\"nofollow noopener noreferrer\")")
-                unsafe_external_links[href].add(file_path)
-
-    # 4. Conversion Check (blog posts only)
-    if file_path.startswith("blog/") and file_path != "blog/index.html":
-        found_conversion = False
-        for kw in CONVERSION_KEYWORDS:
-            if kw in content:
-                found_conversion = True
+            result.external_links_count += 1
+            result.external_links.append((href, not EXTERNAL_LINK_REL.issubset(rel)))
+
+    return result
+
+def audit_file(file_path, parser="html.parser"):
+    return evaluate_page(intern_links(extract_page_facts(file_path, parser)))
+
+class Interner:
+    """Maps strings (or other hashable keys) to dense integer ids (first seen = 0, 1, ...) and back."""
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def get(self, name):
+        return self.ids.get(name)
+
+    def clear(self):
+        self.ids.clear()
+        del self.names[:]
+
+# (href, rel tuple) of every distinct <a href> seen; PageFacts.links holds ids into it, so a
+# link repeated on every page (navigation, footer) is stored once instead of once per page
+page_links = Interner()
+
+def intern_links(page):
+    """Replaces page.links (href, rel) pairs with page_links ids. Main process only: ids are not shared with workers."""
+    page.links = array("I", [page_links.intern((href, tuple(rel))) for href, rel in page.links])
+    return page
+
+def count_ids(ids, n):
+    """Occurrences of each id in 0..n-1 (np.bincount when NumPy is installed)."""
+    if HAS_NUMPY:
+        return np.bincount(np.frombuffer(ids, dtype=np.uint32), minlength=n) if ids else np.zeros(n, dtype=np.int64)
+    counts = array("I", bytes(4 * n))
+    for i in ids:
+        counts[i] += 1
+    return counts
+
+def build_csr(keys, values, n):
+    """
+    Groups values by key (0..n-1) in compressed sparse row form: the values
+    of key k are order[offsets[k]:offsets[k + 1]], in insertion order.
+    """
+    counts = count_ids(keys, n)
+    if HAS_NUMPY:
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        perm = np.argsort(np.frombuffer(keys, dtype=np.uint32), kind="stable") if keys else np.zeros(0, dtype=np.int64)
+        return offsets.tolist(), np.frombuffer(values, dtype=np.uint32)[perm].tolist() if values else []
+    offsets = array("L", bytes(array("L").itemsize * (n + 1)))
+    for k in range(n):
+        offsets[k + 1] = offsets[k] + counts[k]
+    order = array("I", bytes(4 * len(values)))
+    fill = array("L", offsets[:-1])
+    for k, v in zip(keys, values):
+        order[fill[k]] = v
+        fill[k] += 1
+    return offsets, order
+
+class LinkGraph:
+    """
+    Site-wide link graph. Pages and URLs are interned to integer ids and each
+    edge kind is a pair of parallel array("I") columns (source page, target),
+    4 bytes per endpoint instead of a list slot per source in a per-target
+    dict. Per-target groupings are built on demand as CSR, and in-degree /
+    orphan queries run as count_ids() over the edge columns.
+    """
+    def __init__(self):
+        self.pages = Interner() # file paths (sources and internal targets)
+        self.urls = Interner() # external URLs and soft routes
+        self.internal_src, self.internal_dst = array("I"), array("I")
+        self.external_src, self.external_url, self.external_unsafe = array("I"), array("I"), array("B")
+        self.soft_src, self.soft_url = array("I"), array("I")
+        self._csr = {}
+
+    def clear(self):
+        """Drops all edges. Page and URL ids stay valid (PageResult.internal_targets holds page ids)."""
+        self.internal_src, self.internal_dst = array("I"), array("I")
+        self.external_src, self.external_url, self.external_unsafe = array("I"), array("I"), array("B")
+        self.soft_src, self.soft_url = array("I"), array("I")
+        self._csr = {}
+
+    def add_internal(self, source, target):
+        self.internal_src.append(self.pages.intern(source))
+        self.internal_dst.append(self.pages.intern(target))
+        self._csr.clear()
+
+    def add_internal_ids(self, source, targets):
+        """Edges from page source to every page id in targets."""
+        self.internal_src.extend(array("I", [self.pages.intern(source)]) * len(targets))
+        self.internal_dst.extend(targets)
+        self._csr.clear()
+
+    def add_external(self, source, url, is_unsafe):
+        self.external_src.append(self.pages.intern(source))
+        self.external_url.append(self.urls.intern(url))
+        self.external_unsafe.append(1 if is_unsafe else 0)
+        self._csr.clear()
+
+    def add_soft_route(self, source, url):
+        self.soft_src.append(self.pages.intern(source))
+        self.soft_url.append(self.urls.intern(url))
+        self._csr.clear()
+
+    def _grouped(self, kind):
+        if kind not in self._csr:
+            keys, values, n = {
+                "inbound": (self.internal_dst, self.internal_src, len(self.pages)),
+                "external": (self.external_url, self.external_src, len(self.urls)),
+                "soft": (self.soft_url, self.soft_src, len(self.urls)),
+            }[kind]
+            self._csr[kind] = build_csr(keys, values, n)
+        return self._csr[kind]
+
+    def in_degree(self):
+        """Inbound internal link count per page id (duplicates and self-links included)."""
+        return count_ids(self.internal_dst, len(self.pages))
+
+    def sources_of(self, page):
+        """Pages linking to page, one entry per link."""
+        i = self.pages.get(page)
+        if i is None:
+            return []
+        offsets, order = self._grouped("inbound")
+        return [self.pages.names[j] for j in order[offsets[i]:offsets[i + 1]]]
+
+    def unlinked(self, pages):
+        """The pages (an iterable of file paths) that no internal link points to."""
+        degree = self.in_degree()
+        ids = self.pages.ids
+        return [f for f in pages if f not in ids or not degree[ids[f]]]
+
+    def inbound_links(self):
+        """[(page, [source_pages])] for every page with inbound links, by page id."""
+        offsets, order = self._grouped("inbound")
+        names = self.pages.names
+        return [(names[i], [names[j] for j in order[offsets[i]:offsets[i + 1]]])
+                for i in range(len(names)) if offsets[i + 1] > offsets[i]]
+
+    def _url_groups(self, kind):
+        offsets, order = self._grouped(kind)
+        names = self.urls.names
+        return [(names[u], [self.pages.names[j] for j in order[offsets[u]:offsets[u + 1]]])
+                for u in range(len(names)) if offsets[u + 1] > offsets[u]]
+
+    def external_links(self):
+        """[(url, [source_pages])] in first-seen order."""
+        return self._url_groups("external")
+
+    def soft_routes(self):
+        """[(route, [source_pages])] in first-seen order."""
+        return self._url_groups("soft")
+
+    def unsafe_sources(self):
+        """{url: {source_pages}} for external links missing the protective rel values."""
+        unsafe = defaultdict(set)
+        for s, u, flag in zip(self.external_src, self.external_url, self.external_unsafe):
+            if flag:
+                unsafe[self.urls.names[u]].add(self.pages.names[s])
+        return unsafe
+
+link_graph = LinkGraph()
+
+def merge_page_result(result):
+    """Reducer: folds one PageResult into the global link graph, findings and stats."""
+    stats["pages_scanned"] += 1
+    stats["internal_links"] += result.internal_links
+    stats["external_links"] += result.external_links_count
+    errors.extend(result.errors)
+    warnings.extend(result.warnings)
+    clean_url_issues.extend(result.clean_url_issues)
+    redirect_issues.extend(result.redirect_issues)
+
+    for href in result.soft_routes:
+        link_graph.add_soft_route(result.file_path, href)
+    # Record inbound links
+    link_graph.add_internal_ids(result.file_path, result.internal_targets)
+    for href, is_unsafe in result.external_links:
+        # Record external link
+        link_graph.add_external(result.file_path, href, is_unsafe)
+
+    for href in result.network_checks:
+        pending_link_checks.append((result.file_path, href))
+
+def render_cost_score(m):
+    w = RENDER_COST_WEIGHTS
+    inline_kb = (m["inline_script_bytes"] + m["inline_style_bytes"]) / 1024
+    return (len(m["blocking"]) * w["blocking"] + m["images_no_size"] * w["images_no_size"]
+            + m["images_no_lazy"] * w["images_no_lazy"] + inline_kb * w["inline_kb"]
+            + m["dom_nodes"] / 1000 * w["dom_nodes_k"] + (w["lcp_lazy"] if m["lcp_lazy"] else 0))
+
+def report_render_cost(page_facts):
+    """Ranks pages by static render cost, worst first."""
+    ranked = sorted(((render_cost_score(p.render), f, p.render) for f, p in page_facts.items() if p.render),
+                    key=lambda item: (-item[0], item[1]))
+    if not ranked:
+        return
+    print(f"\n{Colors.PURPLE}🎨 渲染成本 (最差 {min(RENDER_REPORT_TOP, len(ranked))} / {len(ranked)} 个页面){Colors.RESET}")
+    for score, f, m in ranked[:RENDER_REPORT_TOP]:
+        inline_kb = (m["inline_script_bytes"] + m["inline_style_bytes"]) / 1024
+        print(f"  - [{score:5.1f}] {f}")
+        print(f"      阻塞资源 {len(m['blocking'])}, 图片 {m['images']} (无宽高 {m['images_no_size']}, 未懒加载 {m['images_no_lazy']}), "
+              f"内联 {inline_kb:.1f}KB, DOM {m['dom_nodes']} 节点 / 深度 {m['dom_depth']}")
+        if m["blocking"]:
+            print(f"      阻塞: {', '.join(str(src) for src in m['blocking'])}")
+        if m["lcp_image"]:
+            lazy = f" {Colors.RED}(被懒加载, 应移除 loading=lazy){Colors.RESET}" if m["lcp_lazy"] else ""
+            print(f"      LCP 候选: {m['lcp_image']}{lazy}")
+
+def build_link_graph():
+    """Edge list (src, dst) over the sorted audited pages from link_graph, one edge per linked page pair."""
+    pages = sorted(f for f in all_html_files if f not in SKIP_FILES)
+    index = {f: i for i, f in enumerate(pages)}
+    # link_graph page id -> position in pages (-1 for pages outside the audit)
+    remap = [index.get(name, -1) for name in link_graph.pages.names]
+    edges = set()
+    for s, t in zip(link_graph.internal_src, link_graph.internal_dst):
+        i, j = remap[s], remap[t]
+        if i >= 0 and j >= 0 and i != j:
+            edges.add((j, i))
+    edges = sorted(edges)
+    return pages, [i for _, i in edges], [j for j, _ in edges]
+
+def compute_link_equity(n, src, dst, damping=PAGERANK_DAMPING, tol=PAGERANK_TOL, max_iter=PAGERANK_MAX_ITER):
+    """
+    PageRank by power iteration over the sparse edge list; pages without
+    outbound links spread their rank uniformly. Uses NumPy (bincount over the
+    COO edge arrays is the sparse mat-vec) when installed. Returns ranks summing to 1.
+    """
+    if n == 0:
+        return []
+    if HAS_NUMPY:
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        outdeg = np.bincount(src, minlength=n).astype(float)
+        dangling = outdeg == 0
+        inv_outdeg = np.zeros(n)
+        inv_outdeg[~dangling] = 1.0 / outdeg[~dangling]
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            flow = np.bincount(dst, weights=(rank * inv_outdeg)[src], minlength=n)
+            new = damping * (flow + rank[dangling].sum() / n) + (1 - damping) / n
+            delta = np.abs(new - rank).sum()
+            rank = new
+            if delta < tol:
                 break
-        
-        if not found_conversion:
-             errors.append(f"[{file_path}] 组件丢失: 未发现侧边栏推广卡片")
+        return rank.tolist()
+
+    outdeg = [0] * n
+    for i in src:
+        outdeg[i] += 1
+    dangling = [i for i in range(n) if outdeg[i] == 0]
+    rank = [1.0 / n] * n
+    for _ in range(max_iter):
+        flow = [0.0] * n
+        for i, j in zip(src, dst):
+            flow[j] += rank[i] / outdeg[i]
+        leak = sum(rank[i] for i in dangling) / n
+        new = [damping * (f + leak) + (1 - damping) / n for f in flow]
+        delta = sum(abs(a - b) for a, b in zip(new, rank))
+        rank = new
+        if delta < tol:
+            break
+    return rank
+
+def load_impressions():
+    """{file_path: impressions} from the GSC page export, matched via canonical URL keys."""
+    csv_files = glob.glob(IMPRESSIONS_CSV)
+    if not csv_files:
+        return {}
+    file_by_key = {canonical_url_key(page_url(f)): f for f in all_html_files}
+    impressions = defaultdict(int)
+    skipped = 0
+    try:
+        with open(csv_files[0], "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                page = file_by_key.get(canonical_url_key((row.get("排名靠前的网页") or "").strip()))
+                if not page:
+                    continue
+                # GSC 导出可能带千分位逗号 ("2,252")，与 matrix_seo_analyzer.clean_metric 一致
+                shown = (row.get("展示") or "0").strip().replace(",", "")
+                try:
+                    impressions[page] += int(float(shown or 0))
+                except ValueError:
+                    skipped += 1
+    except OSError as e:
+        print_warning(f"[提示] 读取 {csv_files[0]} 失败: {e}")
+        return {}
+    if skipped:
+        print_warning(f"[提示] {csv_files[0]}: 跳过 {skipped} 行无法解析的展示数")
+    return dict(impressions)
+
+def report_link_equity():
+    pages, src, dst = build_link_graph()
+    if not pages:
+        return
+    n = len(pages)
+    equity = dict(zip(pages, compute_link_equity(n, src, dst)))
+    outdeg = defaultdict(int)
+    for i in src:
+        outdeg[pages[i]] += 1
+
+    print(f"\n{Colors.BLUE}⚖️  链接权重 (内部 PageRank, 1.00 = 平均){Colors.RESET}")
+    ranked = sorted(pages, key=lambda f: (-round(equity[f], 12), f))
+    for f in ranked[:EQUITY_REPORT_TOP]:
+        print(f"  - {equity[f] * n:6.2f}  {f}")
+    if n > EQUITY_REPORT_TOP:
+        print(f"  ... 最低: {equity[ranked[-1]] * n:.2f} ({ranked[-1]})")
+
+    # Sinks: equity flows in but no internal link passes it on
+    sinks = [f for f in ranked if outdeg[f] == 0 and equity[f] * n >= 1]
+    if sinks:
+        print(f"\n{Colors.YELLOW}🕳️  权重汇点 (无内部出链){Colors.RESET}")
+        for f in sinks[:EQUITY_REPORT_TOP]:
+            print(f"  - {equity[f] * n:6.2f}  {f}")
+
+    impressions = load_impressions()
+    total_impressions = sum(impressions.values())
+    if not total_impressions:
+        return
+    # Impressions are heavy-tailed: the share ratio alone flags nearly every
+    # low-impression page, so each label also requires equity on its side of average
+    under_linked, over_linked = [], []
+    for f, shown in impressions.items():
+        if f not in equity:
+            continue
+        relative = equity[f] * n # 1.00 = average
+        ratio = equity[f] / max(shown / total_impressions, 1e-12)
+        if ratio * EQUITY_MISMATCH_RATIO < 1 and relative < 1:
+            under_linked.append((ratio, f, shown))
+        elif ratio > EQUITY_MISMATCH_RATIO and relative > 1:
+            over_linked.append((-ratio, f, shown))
+    if under_linked:
+        print(f"\n{Colors.YELLOW}📐 曝光高但内链权重低 (相差 > {EQUITY_MISMATCH_RATIO} 倍, 建议从高权重页面增加内链){Colors.RESET}")
+        for _, f, shown in sorted(under_linked)[:EQUITY_REPORT_TOP]:
+            print(f"  - {f} (权重 {equity[f] * n:.2f}, 曝光 {shown})")
+    if over_linked:
+        print(f"\n{Colors.YELLOW}📐 内链权重高但曝光低 (相差 > {EQUITY_MISMATCH_RATIO} 倍, 检查标题/内容匹配度){Colors.RESET}")
+        for _, f, shown in sorted(over_linked)[:EQUITY_REPORT_TOP]:
+            print(f"  - {f} (权重 {equity[f] * n:.2f}, 曝光 {shown})")
+
+def rules_config():
+    """[[rule name, config], ...] of AUDIT_RULES: cached facts are reused only if this is unchanged."""
+    return [[rule.name, rule.config()] for rule in AUDIT_RULES]
+
+def load_facts_cache(parser, path=PAGE_FACTS_FILE):
+    """
+    Returns {file_path: PageFacts} from the previous run, or {} if missing /
+    stale. Facts extracted with another parser backend are stale too.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != PAGE_FACTS_VERSION or data.get("rules") != rules_config() or data.get("parser") != parser:
+        return {}
+    cache = {}
+    for file_path, entry in data.get("pages", {}).items():
+        cache[file_path] = intern_links(PageFacts(**entry))
+    return cache
+
+def save_facts_cache(facts, parser, path=PAGE_FACTS_FILE):
+    """Writes the facts of the pages audited this run; deleted pages drop out of the cache."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "version": PAGE_FACTS_VERSION,
+        "rules": rules_config(),
+        "parser": parser,
+        "pages": {f: dict(asdict(page), rule_stats={}, links=[page_links.names[i] for i in page.links])
+                  for f, page in sorted(facts.items()) if page.read_error is None},
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def extract_pages(files, jobs, parser):
+    """
+    Runs extract_page_facts() over files (any iterable, consumed as it is
+    produced), in a process pool when jobs > 1 and there are enough pages to
+    amortise worker start-up, and yields in order.
+    """
+    files = iter(files)
+    head = list(itertools.islice(files, PARALLEL_MIN_PAGES))
+    if jobs <= 1 or len(head) < PARALLEL_MIN_PAGES:
+        for f in itertools.chain(head, files):
+            yield intern_links(extract_page_facts(f, parser))
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for page in pool.map(functools.partial(extract_page_facts, parser=parser), itertools.chain(head, files), chunksize=4):
+            yield intern_links(page)
+
+def load_page_facts(files, jobs, parser, use_cache=True):
+    """
+    Incremental extraction: returns {file_path: PageFacts} for files, reusing
+    cached facts for pages whose content hash is unchanged and re-parsing the
+    rest. Changed pages are handed to extraction while files is still being read.
+    """
+    cache = load_facts_cache(parser) if use_cache else {}
+    facts = {}
+
+    def changed_files():
+        for f in files:
+            cached = cache.get(f)
+            if cached is not None and cached.digest == file_digest(f):
+                facts[f] = cached
+            else:
+                yield f
+
+    for page in extract_pages(changed_files(), jobs, parser):
+        facts[page.file_path] = page
+        stats["pages_reparsed"] += 1
+        for name, (calls, findings, seconds) in page.rule_stats.items():
+            entry = rule_stats[name]
+            entry[0] += calls
+            entry[1] += findings
+            entry[2] += seconds
+    if use_cache:
+        save_facts_cache(facts, parser)
+    return facts
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="全站 SEO 审计")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="并行审计的进程数 (默认: CPU 核数, 1 = 串行)")
+    parser.add_argument("--full", action="store_true",
+                        help="忽略页面缓存，重新解析全部页面")
+    parser.add_argument("--parser", choices=["auto"] + PARSER_BACKENDS, default="auto",
+                        help="HTML 解析后端 (默认 auto = stream; lxml 会修复文档结构，DOM 节点数/深度与其他后端不同)")
+    parser.add_argument("--format", choices=["text", "json", "sarif"], default="text",
+                        help="输出格式 (json / sarif 供 CI 使用，进度信息输出到 stderr)")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="json / sarif 结果写入文件 (默认 stdout)")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="与之前 --format json 的结果对比，只报告新增 / 已解决的问题；有新增错误时退出码为 1")
+    parser.add_argument("--watch", action="store_true",
+                        help="常驻模式: 监听站点文件变化，只重新审计变更页面及链接到它们的页面")
+    parser.add_argument("--watch-interval", type=float, default=WATCH_INTERVAL,
+                        help=f"监听轮询间隔 (秒, 默认 {WATCH_INTERVAL})")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="配合 --watch: 在 127.0.0.1:PORT/findings 提供最新审计结果 (JSON)")
+    parser.add_argument("--crawl", metavar="BASE_URL",
+                        help="抓取线上站点 (如 https://x-grok.top)，报告 TTFB / 压缩 / 缓存后退出")
+    parser.add_argument("--benchmark-parsers", action="store_true",
+                        help="在当前页面上对比各解析后端的耗时与结果后退出")
+    parser.add_argument("--link-cache", choices=["show", "clear"],
+                        help="查看 / 清空持久化的链接状态缓存后退出")
+    parser.add_argument("--no-link-cache", action="store_true",
+                        help="本次运行不读写持久化链接状态缓存")
+    return parser.parse_args(argv)
+
+def run_crawl(base_url):
+    """--crawl: fetches the live site and reports per-URL timing, size, compression and caching."""
+    if not (HAS_AIOHTTP or HAS_REQUESTS):
+        print_error("❌ 错误: --crawl 需要 aiohttp 或 requests 库。")
+        sys.exit(1)
+    if not urllib.parse.urlsplit(base_url).path:
+        base_url += "/"
+    print(f"{Colors.BOLD}🌐 线上抓取: {base_url} (最多 {CRAWL_MAX_PAGES} 个页面){Colors.RESET}")
+    results = asyncio.run(SiteCrawler(base_url).run())
+
+    print("\n状态      TTFB   总耗时     大小  编码     跳转  URL")
+    for r in results:
+        if r.error:
+            print(f"  {Colors.RED}[ERROR] {r.url}: {r.error}{Colors.RESET}")
+            continue
+        color = Colors.RED if r.status >= 400 else ""
+        print(f"{color}{r.status:<6} {r.ttfb * 1000:5.0f}ms {r.total * 1000:6.0f}ms {r.size / 1024:6.1f}KB  "
+              f"{r.encoding or '-':<8} {r.hops:<5} {r.url}{Colors.RESET if color else ''}")
+
+    # 4xx / 5xx are failures: reported on their own and kept out of the caching, compression and timing stats
+    http_errors = [r for r in results if not r.error and r.status >= 400]
+    ok = [r for r in results if not r.error and r.status < 400]
+    measured = [r for r in ok if not r.known_target] # known_target: only the redirect response was fetched
+    if http_errors:
+        print(f"\n{Colors.RED}❌ HTTP 错误 ({len(http_errors)}){Colors.RESET}")
+        for r in http_errors:
+            print(f"  - [{r.status}] {r.url}" + (f" (跳转后 {r.final_url})" if r.hops else ""))
+    uncompressed = [r for r in measured if r.is_uncompressed()]
+    uncacheable = [r for r in measured if r.is_uncacheable()]
+    slow = [r for r in measured if r.is_slow()]
+    redirected = [r for r in ok if r.hops]
+    if uncompressed:
+        print(f"\n{Colors.YELLOW}🗜️  未压缩传输 ({len(uncompressed)}){Colors.RESET}")
+        for r in uncompressed:
+            print(f"  - {r.url} ({r.size / 1024:.1f}KB, {r.content_type})")
+    if uncacheable:
+        print(f"\n{Colors.YELLOW}🧊 不可缓存 ({len(uncacheable)}){Colors.RESET}")
+        for r in uncacheable:
+            print(f"  - {r.url} (Cache-Control: {r.cache_control or '无'}, ETag: {r.etag or '无'})")
+    if slow:
+        print(f"\n{Colors.YELLOW}🐢 响应慢 (TTFB > {CRAWL_SLOW_TTFB * 1000:.0f}ms 或总耗时 > {CRAWL_SLOW_TOTAL:.0f}s) ({len(slow)}){Colors.RESET}")
+        for r in sorted(slow, key=lambda r: -r.ttfb):
+            print(f"  - {r.url} (TTFB {r.ttfb * 1000:.0f}ms, 总耗时 {r.total * 1000:.0f}ms)")
+    if redirected:
+        print(f"\n{Colors.YELLOW}🔄 经过跳转 ({len(redirected)}){Colors.RESET}")
+        for r in redirected:
+            print(f"  - {r.url} -> {r.final_url} ({r.hops} 跳)")
+
+    if ok:
+        ttfbs = sorted(r.ttfb for r in ok)
+        p50 = ttfbs[len(ttfbs) // 2]
+        p95 = ttfbs[min(len(ttfbs) - 1, int(len(ttfbs) * 0.95))]
+        print(f"\n{Colors.GREEN}🟢 抓取 {len(results)} 个 URL, 失败 {len(results) - len(ok)} (HTTP 错误 {len(http_errors)}), "
+              f"TTFB p50 {p50 * 1000:.0f}ms / p95 {p95 * 1000:.0f}ms, 共 {sum(r.size for r in ok) / 1024:.1f}KB{Colors.RESET}")
+
+def finding_rule(message):
+    """(file, rule) of a finding message "[file] [TAG] Rule: detail"; file is None for site-wide findings."""
+    file_path = None
+    match = re.match(r"\[([^\]]+)\]\s*(.*)", message)
+    if match and "WARNING" not in match.group(1):
+        file_path, message = match.group(1), match.group(2)
+    message = re.sub(r"^\[[A-Z ]+\]\s*", "", message)
+    return file_path, re.split(r"[:：(]", message, 1)[0].strip()
+
+def collect_findings():
+    """
+    All findings as dicts with a stable id: sha1 of category, message and the
+    occurrence number of identical messages, so ids survive reordering and
+    unrelated edits elsewhere in the site.
+    """
+    sources = [
+        ("error", "error", errors),
+        ("warning", "warning", warnings),
+        ("sitemap", "warning", sitemap_warnings),
+        ("redirect", "warning", redirect_issues),
+        ("clean-url", "note", clean_url_issues),
+    ]
+    findings = []
+    seen = defaultdict(int)
+    for category, level, messages in sources:
+        for message in messages:
+            occurrence = seen[(category, message)]
+            seen[(category, message)] += 1
+            file_path, rule = finding_rule(message)
+            findings.append({
+                "id": hashlib.sha1(f"{category}|{message}|{occurrence}".encode("utf-8")).hexdigest()[:16],
+                "category": category,
+                "level": level,
+                "rule": rule,
+                "file": file_path,
+                "message": message,
+            })
+    return findings
+
+def render_findings(fmt, findings, score, new=None, resolved=None):
+    """JSON or SARIF 2.1.0 document. With a baseline only new (and resolved) findings are included."""
+    if fmt == "json":
+        doc = {"version": 1, "score": score, "stats": dict(stats)}
+        if new is None:
+            doc["findings"] = findings
+        else:
+            doc["new"] = new
+            doc["resolved"] = resolved
+        return json.dumps(doc, ensure_ascii=False, indent=2)
+
+    results = []
+    listed = [(f, "new") for f in new] + [(f, "absent") for f in resolved] if new is not None else [(f, None) for f in findings]
+    rules = {}
+    for f, state in listed:
+        rule_id = f"{f['category']}/{f['rule']}"
+        rules.setdefault(rule_id, {"id": rule_id, "shortDescription": {"text": f["rule"]}})
+        result = {
+            "ruleId": rule_id,
+            "level": f["level"],
+            "message": {"text": f["message"]},
+            "partialFingerprints": {"auditFindingId/v1": f["id"]},
+        }
+        if f["file"]:
+            result["locations"] = [{"physicalLocation": {"artifactLocation": {"uri": f["file"]}}}]
+        if state:
+            result["baselineState"] = state
+        results.append(result)
+    return json.dumps({
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "version": "2.1.0",
+        "runs": [{
+            "tool": {"driver": {"name": "audit.py", "informationUri": SITE_URL, "rules": list(rules.values())}},
+            "results": results,
+        }],
+    }, ensure_ascii=False, indent=2)
+
+def write_output(text, path=None):
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+def load_baseline(path):
+    """{id: finding} from a previous --format json run."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+    except (OSError, ValueError) as e:
+        print_error(f"❌ 错误: 无法读取基线 {path}: {e}")
+        sys.exit(2)
+    if "findings" not in doc:
+        print_error(f"❌ 错误: {path} 不是完整的 JSON 审计结果 (请用不带 --baseline 的 --format json 生成)")
+        sys.exit(2)
+    return {f["id"]: f for f in doc["findings"]}
+
+def print_baseline_diff(new, resolved, baseline_path):
+    print(f"{Colors.BOLD}📊 相对基线 {baseline_path} 的变化{Colors.RESET}")
+    if new:
+        print(f"\n{Colors.RED}🆕 新增问题 ({len(new)}){Colors.RESET}")
+        for f in new:
+            color = Colors.RED if f["level"] == "error" else Colors.YELLOW
+            print(f"  - {color}[{f['level']}]{Colors.RESET} {f['message']}")
+    else:
+        print(f"\n{Colors.GREEN}🆕 新增问题: 无{Colors.RESET}")
+    if resolved:
+        print(f"\n{Colors.GREEN}✅ 已解决 ({len(resolved)}){Colors.RESET}")
+        for f in resolved:
+            print(f"  - {f['message']}")
+
+PARITY_FIELDS = ("title", "description", "canonical", "links", "errors", "warnings", "clean_url_issues", "render", "anchors")
+
+def benchmark_parsers(files, rounds=3):
+    """Times every available backend on files and checks that they produce identical facts."""
+    backends = [b for b in PARSER_BACKENDS if b != "lxml" or HAS_LXML]
+    print(f"{Colors.BOLD}⏱️  解析后端基准 ({len(files)} 个页面, 取 {rounds} 轮最快){Colors.RESET}")
+    reference = None
+    baseline = None
+    for backend in backends:
+        best = None
+        for _ in range(rounds):
+            started = time.perf_counter()
+            facts = [extract_page_facts(f, backend) for f in files]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        findings = [{name: getattr(p, name) for name in PARITY_FIELDS} for p in facts]
+        if reference is None:
+            reference, baseline = findings, best
+        same = f"{Colors.GREEN}[一致]{Colors.RESET}" if findings == reference else f"{Colors.RED}[结果不一致]{Colors.RESET}"
+        print(f"  - {backend:<12} {best * 1000:8.1f} ms  x{baseline / best:5.2f}  {same}")
+        if findings != reference:
+            # Which facts differ from the first backend, and on how many pages
+            differing = defaultdict(list)
+            for f, page, ref in zip(files, findings, reference):
+                for name in PARITY_FIELDS:
+                    if name == "render":
+                        for key in sorted(set(page[name]) | set(ref[name])):
+                            if page[name].get(key) != ref[name].get(key):
+                                differing[f"render.{key}"].append(f)
+                    elif page[name] != ref[name]:
+                        differing[name].append(f)
+            for name, pages in sorted(differing.items()):
+                print(f"      {name}: {len(pages)} 个页面不同 (如 {pages[0]})")
+
+def manage_link_cache(action):
+    store = LinkStatusStore()
+    try:
+        if action == "clear":
+            print(f"🧹 已清空链接状态缓存: {store.clear()} 条 ({store.path})")
+            return
+        entries = store.all()
+        now = time.time()
+        print(f"{Colors.BOLD}🗄️  链接状态缓存 ({len(entries)} 条, {store.path}){Colors.RESET}")
+        for url, entry in entries:
+            age = (now - (entry.checked_at or 0)) / 3600
+            fresh = f"{Colors.GREEN}[FRESH]{Colors.RESET}" if store.is_fresh(entry, now) else f"{Colors.YELLOW}[STALE]{Colors.RESET}"
+            etag = " ETag" if entry.etag else ""
+            print(f"  - {fresh} [{entry.status}] {url} ({age:.1f}h 前{etag}){' -> ' + entry.location if entry.location else ''}")
+    finally:
+        store.close()
 
 def main():
+    args = parse_args()
+    if args.link_cache:
+        manage_link_cache(args.link_cache)
+        return
+
+    if args.crawl:
+        run_crawl(args.crawl)
+        return
+
+    if args.watch:
+        daemon = AuditDaemon(args)
+        if args.serve:
+            serve_findings(daemon, args.serve)
+        daemon.run()
+        return
+
+    if args.benchmark_parsers:
+        files = sorted(iter_html_files(ROOT_DIR))
+        benchmark_parsers(files)
+        return
+
+    machine_output = args.format != "text" or args.baseline
+    if machine_output:
+        # Progress goes to stderr so stdout carries only the findings document
+        with contextlib.redirect_stdout(sys.stderr):
+            page_facts, orphans, final_score = run_audit(args)
+    else:
+        page_facts, orphans, final_score = run_audit(args)
+
+    findings = collect_findings()
+    if not args.baseline:
+        if args.format == "text":
+            print_report(page_facts, orphans, final_score)
+        else:
+            write_output(render_findings(args.format, findings, final_score), args.output)
+        return
+
+    baseline = load_baseline(args.baseline)
+    current_ids = {f["id"] for f in findings}
+    new = [f for f in findings if f["id"] not in baseline]
+    resolved = [f for fid, f in baseline.items() if fid not in current_ids]
+    if args.format == "text":
+        print_baseline_diff(new, resolved, args.baseline)
+    else:
+        write_output(render_findings(args.format, findings, final_score, new=new, resolved=resolved), args.output)
+    if any(f["level"] == "error" for f in new):
+        sys.exit(1)
+
+def run_audit(args):
+    """Steps 1-4: index, page audit, link checks, orphans and sitemaps. Returns (page_facts, orphans, score)."""
+    global link_status_store
+    if not args.no_link_cache and (HAS_AIOHTTP or HAS_REQUESTS):
+        link_status_store = LinkStatusStore()
+
     print(f"{Colors.BOLD}🚀 开始全站 SEO 审计...{Colors.RESET}")
     print("-" * 30)
 
     # 1. Map Files
-    files = get_html_files(ROOT_DIR)
-    global all_html_files
-    all_html_files = set([normalize_path(f) for f in files])
-    
-    print(f"📦 建立索引: 发现 {len(all_html_files)} 个 HTML 页面")
-    
+    global site_index, site_redirects
+    site_index = SiteIndex(ROOT_DIR)
+    site_redirects = Redirects.load(os.path.join(ROOT_DIR, REDIRECTS_FILE), SITE_DOMAIN)
+
     # 2. Crawl & Analyze
-    for f in all_html_files:
-        if f in SKIP_FILES: continue
-        audit_file(f)
-        
+    # Pages stream from the recursive scan into extraction; only changed pages are
+    # re-parsed and the link graph is rebuilt from all facts
+    def discovered_pages():
+        for f in iter_html_files(ROOT_DIR):
+            all_html_files.add(f)
+            yield f
+
+    all_html_files.clear()
+    parser = resolve_parser(args.parser)
+    page_facts = load_page_facts(discovered_pages(), args.jobs, parser, use_cache=not args.full)
+    audit_targets = sorted(page_facts)
+    print(f"📦 建立索引: 发现 {len(all_html_files)} 个 HTML 页面")
+    print(f"♻️  增量审计: 重新解析 {stats['pages_reparsed']} / {len(audit_targets)} 个页面")
+    page_anchors.update((f, set(page.anchors)) for f, page in page_facts.items())
+    for f in audit_targets:
+        merge_page_result(evaluate_page(page_facts[f]))
+    check_redirects()
+    if link_status_store is not None:
+        link_status_store.close()
+        link_status_store = None
+    orphans, final_score = finish_audit()
+    return page_facts, orphans, final_score
+
+def finish_audit():
+    """Steps 3-4 on the merged page results: orphans, sitemaps and the score. Returns (orphans, score)."""
     # 3. Weight Flow (Orphans)
-    orphans = []
-    for f in all_html_files:
-        if f == "index.html": continue
-        if f in SKIP_FILES: continue
-        if f not in linked_pages:
-            orphans.append(f)
-            warnings.append(f"[{f}] 孤岛页面: 存在但从未被内部链接引用")
+    candidates = sorted(f for f in all_html_files if f != "index.html" and f not in SKIP_FILES)
+    orphans = link_graph.unlinked(candidates)
+    for f in orphans:
+        warnings.append(f"[{f}] 孤岛页面: 存在但从未被内部链接引用")
             
     # 4. Sitemap Check
     check_sitemaps()
+    if site_redirects is not None:
+        warnings.extend(site_redirects.problems)
 
     # Calculate Score
     base_score = 100
     deduction = (len(errors) * 5) + (len(warnings) * 1) + (len(sitemap_warnings) * 2) + (len(clean_url_issues) * 0.5) + (len(redirect_issues) * 2)
     final_score = max(0, base_score - deduction)
-    
+    return orphans, final_score
+
+def reset_report_state():
+    """Clears the module-level link graph, findings and counters before results are merged again."""
+    for collection in (link_graph, sitemap_xml_urls, sitemap_html_urls):
+        collection.clear()
+    for findings in (errors, warnings, sitemap_warnings, clean_url_issues, redirect_issues, pending_link_checks):
+        del findings[:]
+    for key in ("pages_scanned", "internal_links", "external_links"):
+        stats[key] = 0
+
+class AuditDaemon:
+    """
+    --watch: long-running audit. Page facts and per-page results stay in
+    memory; the tree is polled for changes, changed pages are re-parsed and
+    re-evaluated together with the pages linking to them (all pages, without
+    re-parsing, when files are added or removed), and the merged findings
+    are published to the console and to the optional HTTP endpoint.
+    Network link checks run on a background worker so a slow host never
+    blocks change detection; their results are published when they arrive.
+    """
+    def __init__(self, args):
+        self.parser = resolve_parser(args.parser)
+        self.jobs = args.jobs
+        self.interval = args.watch_interval
+        self.use_link_cache = not args.no_link_cache
+        self.link_queue = queue.Queue()
+        self.link_queued = set()
+        self.links_checked = threading.Event()
+        self.link_worker = None
+        self.facts = {}
+        self.results = {}
+        self.mtimes = {}
+        self.findings = {}
+        self.generation = 0
+        self.document = "{}"
+        self.updated = threading.Condition()
+
+    def snapshot(self):
+        """{rel_path: (mtime_ns, size)} for every file in the site tree."""
+        snap = {}
+        for rel_path, is_dir in scan_tree(ROOT_DIR):
+            if not is_dir:
+                try:
+                    st = os.stat(os.path.join(ROOT_DIR, rel_path))
+                except OSError:
+                    continue
+                snap[rel_path] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def is_page(self, rel_path):
+        return rel_path.endswith(".html") and not is_ignored(rel_path) and \
+            not any(is_ignored(parent, True) for parent in self._parents(rel_path))
+
+    @staticmethod
+    def _parents(rel_path):
+        parts = rel_path.split("/")[:-1]
+        return ["/".join(parts[:i + 1]) for i in range(len(parts))]
+
+    def check_links_worker(self):
+        """Background thread: checks queued URLs into link_status_cache (the SQLite store lives on this thread)."""
+        global link_status_store
+        if self.use_link_cache:
+            link_status_store = LinkStatusStore()
+        try:
+            while True:
+                urls = self.link_queue.get()
+                if urls is None:
+                    break
+                check_links(urls)
+                self.links_checked.set()
+        finally:
+            if link_status_store is not None:
+                link_status_store.close()
+                link_status_store = None
+
+    def start(self):
+        global site_index, site_redirects
+        if HAS_AIOHTTP or HAS_REQUESTS:
+            self.link_worker = threading.Thread(target=self.check_links_worker, daemon=True)
+            self.link_worker.start()
+        started = time.perf_counter()
+        self.mtimes = self.snapshot()
+        site_index = SiteIndex(ROOT_DIR)
+        site_redirects = Redirects.load(os.path.join(ROOT_DIR, REDIRECTS_FILE), SITE_DOMAIN)
+        all_html_files.clear()
+        all_html_files.update(f for f in self.mtimes if self.is_page(f))
+        self.facts = load_page_facts(sorted(all_html_files), self.jobs, self.parser)
+        self.results = {f: evaluate_page(page) for f, page in self.facts.items()}
+        self.publish(self.rebuild(), started, f"初始审计 {len(self.facts)} 个页面")
+
+    def rebuild(self):
+        """Re-merges all per-page results into the global report state; returns the findings."""
+        reset_report_state()
+        page_anchors.clear()
+        page_anchors.update((f, set(page.anchors)) for f, page in self.facts.items())
+        for f in sorted(self.results):
+            merge_page_result(self.results[f])
+        urls = [href for _, href in pending_link_checks]
+        missing = [u for u in dict.fromkeys(urls) if u not in link_status_cache and u not in self.link_queued]
+        if missing and self.link_worker is not None:
+            self.link_queued.update(missing)
+            self.link_queue.put(missing)
+        with contextlib.redirect_stdout(io.StringIO()):
+            check_redirects({u: link_status_cache[u] for u in urls if u in link_status_cache})
+            _, self.score = finish_audit()
+        return collect_findings()
+
+    def poll(self):
+        global site_index, site_redirects
+        snap = self.snapshot()
+        if snap == self.mtimes:
+            return
+        started = time.perf_counter()
+        changed = {f for f, stamp in snap.items() if self.mtimes.get(f) != stamp}
+        removed = self.mtimes.keys() - snap.keys()
+        added = snap.keys() - self.mtimes.keys()
+        self.mtimes = snap
+
+        changed_pages = {f for f in changed if self.is_page(f)}
+        removed_pages = {f for f in removed if f in self.facts}
+        redirects_changed = REDIRECTS_FILE in changed or REDIRECTS_FILE in removed
+        if added or removed:
+            site_index = SiteIndex(ROOT_DIR)
+        if redirects_changed:
+            site_redirects = Redirects.load(os.path.join(ROOT_DIR, REDIRECTS_FILE), SITE_DOMAIN)
+        for f in removed_pages:
+            all_html_files.discard(f)
+            self.facts.pop(f, None)
+            self.results.pop(f, None)
+        all_html_files.update(changed_pages)
+        for page in extract_pages(sorted(changed_pages), self.jobs, self.parser):
+            self.facts[page.file_path] = page
+        page_anchors.update((f, set(self.facts[f].anchors)) for f in changed_pages)
+
+        if added or removed or redirects_changed:
+            # Link resolution changes for every page; re-evaluate all (no re-parsing)
+            affected = set(self.facts)
+        else:
+            affected = set(changed_pages)
+            for f in changed_pages:
+                affected.update(link_graph.sources_of(f))
+        for f in affected:
+            if f in self.facts:
+                self.results[f] = evaluate_page(self.facts[f])
+        self.publish(self.rebuild(), started,
+                     f"{len(changed) + len(removed)} 个文件变更: 重新解析 {len(changed_pages)} 页, 重新评估 {len(affected)} 页")
+
+    def publish(self, findings, started, summary):
+        current = {f["id"]: f for f in findings}
+        new = [f for fid, f in current.items() if fid not in self.findings]
+        resolved = [f for fid, f in self.findings.items() if fid not in current]
+        self.findings = current
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{Colors.CYAN}[{time.strftime('%H:%M:%S')}] {summary}, {elapsed:.0f} ms, "
+              f"共 {len(findings)} 条问题, 评分 {self.score}/100{Colors.RESET}")
+        if self.generation:
+            lines = [f"  {Colors.RED if f['level'] == 'error' else Colors.YELLOW}+ {f['message']}{Colors.RESET}" for f in new]
+            lines += [f"  {Colors.GREEN}- {f['message']}{Colors.RESET}" for f in resolved]
+            for line in lines[:20]:
+                print(line)
+            if len(lines) > 20:
+                print(f"  ... (共新增 {len(new)} / 解决 {len(resolved)} 条，完整列表见 /findings)")
+        with self.updated:
+            self.generation += 1
+            self.document = json.dumps({
+                "generation": self.generation,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "score": self.score,
+                "stats": dict(stats),
+                "new": new,
+                "resolved": resolved,
+                "findings": findings,
+            }, ensure_ascii=False)
+            self.updated.notify_all()
+
+    def wait_for(self, generation, timeout):
+        """Blocks until a generation newer than `generation` is published (long-poll)."""
+        with self.updated:
+            self.updated.wait_for(lambda: self.generation > generation, timeout)
+            return self.document
+
+    def run(self):
+        self.start()
+        print(f"👀 正在监听 {os.path.abspath(ROOT_DIR)} (每 {self.interval}s 检查一次, Ctrl+C 退出)")
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.poll()
+                if self.links_checked.is_set():
+                    self.links_checked.clear()
+                    started = time.perf_counter()
+                    self.publish(self.rebuild(), started, "联网链接检查完成")
+        except KeyboardInterrupt:
+            print("\n已停止监听。")
+        finally:
+            if self.link_worker is not None:
+                self.link_queue.put(None)
+                self.link_worker.join(LINK_CHECK_TIMEOUT)
+
+def serve_findings(daemon, port):
+    """
+    Local endpoint for the daemon: GET /findings returns the latest findings
+    as JSON; GET /findings?since=N waits (up to WATCH_LONG_POLL seconds) for
+    a generation newer than N, so clients get updates pushed as they happen.
+    """
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            if url.path not in ("/", "/findings"):
+                self.send_error(404)
+                return
+            since = urllib.parse.parse_qs(url.query).get("since")
+            if since and since[0].isdigit():
+                body = daemon.wait_for(int(since[0]), WATCH_LONG_POLL)
+            else:
+                body = daemon.document
+            body = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📡 审计结果: http://127.0.0.1:{port}/findings")
+    return server
+
+def print_report(page_facts, orphans, final_score):
     # 5. Report
     print("\n" + "="*50)
     print(f"{Colors.BOLD}📊 审计报告{Colors.RESET}")
@@ -489,23 +2556,20 @@ def main():
 
     # Soft Routing Report
     print(f"\n{Colors.PURPLE}🛍️  软路由/销售链接分布{Colors.RESET}")
-    if soft_routing_map:
-        # Load _redirects to verify validity
-        valid_redirects = set()
-        if os.path.exists("_redirects"):
-            try:
-                with open("_redirects", "r", encoding="utf-8") as f:
-                    for line in f:
-                        parts = line.strip().split()
-                        if parts and parts[0].startswith("/"):
-                            valid_redirects.add(parts[0])
-            except Exception as e:
-                print(f"  {Colors.RED}[ERROR] 读取 _redirects 失败: {e}{Colors.RESET}")
+    soft_routes = link_graph.soft_routes()
+    if soft_routes:
+        # Resolve against the compiled _redirects rules
+        for url, sources in soft_routes:
+            resolution = site_redirects.resolve(url.split("#")[0].split("?")[0]) if site_redirects else None
+            if resolution is None or not resolution.hops:
+                print(f"  - {url} {Colors.RED}[INVALID]{Colors.RESET}")
+            elif resolution.loop:
+                print(f"  - {url} {Colors.RED}[LOOP]{Colors.RESET} {resolution.chain()}")
+            else:
+                hops = resolution.hops
+                chain = f", {len(hops)} 跳" if len(hops) > 1 else ""
+                print(f"  - {url} {Colors.GREEN}[VALID]{Colors.RESET} {hops[-1].status} -> {resolution.final} (_redirects:{hops[0].rule.line}{chain})")
 
-        for url, sources in soft_routing_map.items():
-            status = f"{Colors.GREEN}[VALID]{Colors.RESET}" if url in valid_redirects else f"{Colors.RED}[INVALID]{Colors.RESET}"
-            print(f"  - {url} {status}")
-            
             unique_sources = sorted(list(set(sources)))
             for src in unique_sources:
                 # Rule Check: Only allowed on index.html (or explicitly allowed pages)
@@ -535,8 +2599,10 @@ def main():
 
     # External Links Report
     print(f"\n{Colors.CYAN}🌐 外链审计 (Top 50){Colors.RESET}")
-    if external_links_map:
-        sorted_ext = sorted(external_links_map.items(), key=lambda x: len(x[1]), reverse=True)
+    external_links = link_graph.external_links()
+    if external_links:
+        unsafe_external_links = link_graph.unsafe_sources()
+        sorted_ext = sorted(external_links, key=lambda x: len(x[1]), reverse=True)
         for url, sources in sorted_ext[:50]:
             print(f"  - [{len(sources)}] {url}")
             
@@ -557,7 +2623,7 @@ def main():
 
     # Inbound Links Report
     print(f"\n{Colors.BLUE}🔗 内链分布 (全部){Colors.RESET}")
-    sorted_links = sorted(inbound_links.items(), key=lambda x: len(x[1]), reverse=True)
+    sorted_links = sorted(link_graph.inbound_links(), key=lambda x: (-len(x[1]), x[0]))
     
     for page, sources in sorted_links:
         print(f"  - [{len(sources)}] {page}")
@@ -565,21 +2631,29 @@ def main():
     # Low internal links warning
     print(f"\n{Colors.YELLOW}📉 低权重页面 (入度 < 3){Colors.RESET}")
     low_weight_count = 0
-    for f in all_html_files:
+    degree = link_graph.in_degree()
+    orphan_set = set(orphans)
+    for f in sorted(all_html_files):
         if f == "index.html": continue
         if f in SKIP_FILES: continue
-        count = len(inbound_links.get(f, []))
-        if count < 3 and f not in orphans: # orphans already reported
+        i = link_graph.pages.get(f)
+        count = 0 if i is None else int(degree[i])
+        if count < 3 and f not in orphan_set: # orphans already reported
             low_weight_count += 1
             if low_weight_count <= 10:
                 print(f"  - [{count}] {f}")
     if low_weight_count > 10:
         print(f"  ... (共 {low_weight_count} 个页面入度不足)")
 
+    report_link_equity()
+    report_render_cost(page_facts)
+
     print(f"\n{Colors.GREEN}🟢 健康状态{Colors.RESET}")
     print(f"  - 总页面数: {stats['pages_scanned']}")
     print(f"  - 内链总数: {stats['internal_links']}")
     print(f"  - 外链总数: {stats['external_links']}")
+    if stats["link_requests"]:
+        print(f"  - 联网检查链接: {stats['link_requests']} (其中 304 复验: {stats['link_revalidated']})")
     print(f"  - 孤岛页面: {len(orphans)}")
     
     score_color = Colors.GREEN
@@ -588,8 +2662,13 @@ def main():
     
     print(f"  - 健康度评分: {score_color}{final_score}/100{Colors.RESET}")
 
-    if not HAS_REQUESTS:
-        print(f"\n{Colors.YELLOW}[提示] 未检测到 requests 库，跳过 302 重定向检查。{Colors.RESET}")
+    if rule_stats:
+        print(f"\n{Colors.CYAN}⏱️  规则耗时 (本次解析 {stats['pages_reparsed']} 个页面){Colors.RESET}")
+        for name, (calls, findings, seconds) in sorted(rule_stats.items(), key=lambda item: -item[1][2]):
+            print(f"  - {name:<18} {seconds * 1000:8.1f} ms  调用 {calls:>6}  发现 {findings:>4}")
+
+    if not (HAS_AIOHTTP or HAS_REQUESTS):
+        print(f"\n{Colors.YELLOW}[提示] 未检测到 aiohttp / requests 库，跳过 302 重定向检查。{Colors.RESET}")
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,21 @@
 import os
 import re
+import sys
+import csv
 import json
+import gzip
+import glob
+import hashlib
 import datetime
 import random
 import shutil
+import subprocess
 import textwrap
+import urllib.parse
+from collections import Counter
+from xml.sax.saxutils import escape as xml_escape
 from bs4 import BeautifulSoup
+from redirects import Redirects, REDIRECTS_FILE
 
 # 1. 基础配置
 SITE_URL = "https://x-grok.top"
@@ -26,11 +36,56 @@ POLICIES_BODY_TEMPLATE = os.path.join(TEMPLATES_DIR, "policies_body.html")
 SIDEBAR_CARD_TEMPLATE = os.path.join(TEMPLATES_DIR, "sidebar_card.html")
 RELATED_POSTS_TEMPLATE = os.path.join(TEMPLATES_DIR, "related_posts.html")
 SITEMAP_TEMPLATE_FILE = os.path.join(TEMPLATES_DIR, "sitemap_template.html")
+SERVICE_WORKER_TEMPLATE = os.path.join(TEMPLATES_DIR, "sw.js")
+LAYOUT_STYLESHEET = os.path.join("assets", "blog.css") # layout 中的 {{ version }} 取此文件的内容哈希
+
+# Local build state (gitignored cache: a fresh checkout / CI rebuilds lastmods from git history)
+BUILD_STATE_DIR = ".build"
+LASTMOD_STATE_FILE = os.path.join(BUILD_STATE_DIR, "lastmod.json")
+
+# Sitemap 协议限制 (sitemaps.org): 单文件最多 50,000 个 URL / 50MB (未压缩)
+SITEMAP_MAX_URLS = 50000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+SITEMAP_GZIP = False # True: 分片写为 sitemap-N.xml.gz，并始终生成 sitemap index
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+# Speculation Rules: 预取"相关阅读"与教程导航，降低下一跳的冷启动耗时
+PREFETCH_EAGERNESS = "moderate" # immediate / eager / moderate (悬停) / conservative (按下)
+PREFETCH_MAX_URLS = 3 # 每页最多预取的 URL 数 (含 /blog/)，控制流量消耗
+PREFETCH_FALLBACK = True # 不支持 Speculation Rules 的浏览器退回 <link rel="prefetch">
+
+# 构建清单：本次构建输出的每个页面 (path, url, kind, fingerprint)，供后续阶段使用
+BUILD_MANIFEST = []
+
+# _redirects: 站内链接直接改写为最终目标，访客无需经过重定向往返 (/go/ 软路由保持不变)
+SITE_REDIRECTS = None # 首次 write_file() 时加载
+REWRITTEN_LINKS = [] # (page_path, old_href, new_href)
 
 def read_file(path):
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
+def resolve_redirected_href(href, page_path):
+    """
+    Final same-site target of href after the _redirects rules, keeping the
+    query (unless the rule sets one) and the #fragment. Returns None when no
+    redirect applies, the chain loops or leaves the site.
+    """
+    global SITE_REDIRECTS
+    if SITE_REDIRECTS is None:
+        SITE_REDIRECTS = Redirects.load(os.path.join(OUTPUT_DIR, REDIRECTS_FILE), SITE_DOMAIN)
+    if not SITE_REDIRECTS or href.startswith('/go/') or href.startswith('#'):
+        return None
+    page_url = "/" + os.path.normpath(page_path).replace("\\", "/")
+    url = urllib.parse.urlsplit(urllib.parse.urljoin(SITE_URL + page_url, href))
+    if url.scheme not in ("http", "https") or SITE_REDIRECTS.internal_path(href) is None:
+        return None
+    resolution = SITE_REDIRECTS.resolve(url.path or "/")
+    if not resolution.redirects or resolution.loop or resolution.external:
+        return None
+    query = urllib.parse.urlsplit(resolution.hops[-1].destination).query or url.query
+    return resolution.final + (f"?{query}" if query else "") + (f"#{url.fragment}" if url.fragment else "")
+
 def write_file(path, content):
     if path.endswith(".html"):
         try:
@@ -40,6 +95,12 @@ def write_file(path, content):
             # Auto-add rel attributes for SEO and security
             for a in soup.find_all('a', href=True):
                 href = a['href']
+
+                # 0. Internal links that hit a _redirects rule point straight at the final target
+                final_href = resolve_redirected_href(href, path)
+                if final_href and final_href != href:
+                    REWRITTEN_LINKS.append((path, href, final_href))
+                    a['href'] = href = final_href
                 
                 # 1. Soft Routing / Sales Links (Strict protection with 'sponsored')
                 if href.startswith('/go/'):
@@ -56,16 +117,51 @@ def write_file(path, content):
     with open(path, "w", encoding="utf-8") as f:
         f.write(content)
 
+def content_fingerprint(*content_parts):
+    """sha1 of the parts with whitespace removed (prettify() re-indents the posts on every build)."""
+    h = hashlib.sha1()
+    for part in content_parts:
+        h.update(re.sub(r'\s+', '', str(part)).encode("utf-8"))
+    return h.hexdigest()
+
+def source_path(path):
+    return os.path.normpath(path).replace("\\", "/")
+
+def register_page(path, url, kind, *content_parts, sources=()):
+    """
+    Records a built page in BUILD_MANIFEST.
+    The fingerprint only covers the page's own content (not layout/version),
+    so it changes only when the page content really changes. sources are the
+    input files that content comes from (body template, post source); their
+    git history dates pages that have no lastmod state yet.
+    """
+    BUILD_MANIFEST.append({
+        "path": source_path(path),
+        "url": url,
+        "kind": kind,
+        "fingerprint": content_fingerprint(*content_parts),
+        "sources": [source_path(src) for src in sources]
+    })
+
+def file_version(path):
+    """Short content hash for ?v= cache busting: the URL (and every cache of it) only changes with the file."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()[:10]
+    except OSError:
+        return VERSION
+
 def inject_layout_vars(html, assets_path):
-    """Injects assets_path and version into the layout."""
+    """Injects assets_path and the stylesheet version into the layout."""
     html = html.replace("{{ assets_path }}", assets_path)
-    html = html.replace("{{ version }}", VERSION)
+    html = html.replace("{{ version }}", file_version(LAYOUT_STYLESHEET))
     return html
 
 # 2. 文章元数据提取
-def extract_metadata(filename):
+def extract_metadata(filename, content=None, verbose=True):
     path = os.path.join(SOURCE_DIR, filename)
-    content = read_file(path)
+    if content is None:
+        content = read_file(path)
     
     # Title
     # Try to find H1 first for the rich title (with HTML tags)
@@ -125,7 +221,8 @@ def extract_metadata(filename):
         if marker in article_content:
             parts = article_content.split(marker)
             if "相关阅读" in parts[-1]:
-                print(f"Removed 'Related Reading' section from {filename}")
+                if verbose:
+                    print(f"Removed 'Related Reading' section from {filename}")
                 article_content = marker.join(parts[:-1])
                 break
     
@@ -158,6 +255,39 @@ def extract_metadata(filename):
         "image_url": image_url
     }
 
+def parse_date(d):
+    if not d:
+        return datetime.datetime.min
+    try:
+        return datetime.datetime.strptime(d, "%Y-%m-%d")
+    except ValueError:
+        try:
+            return datetime.datetime.strptime(d, "%Y年%m月%d日")
+        except ValueError:
+            # Try handling single digit month/day just in case
+            try:
+                return datetime.datetime.strptime(d, "%Y年%-m月%-d日")
+            except ValueError:
+                print(f"Warning: Could not parse date '{d}', using min date.")
+                return datetime.datetime.min
+
+def post_fingerprint(post):
+    return content_fingerprint(post['clean_title'], post['description'], post['content'])
+
+def post_sources(posts):
+    return [os.path.join(SOURCE_DIR, post['filename']) for post in posts]
+
+def source_digest(path, content):
+    """
+    Digest of what a source file contributes to its pages. Post sources are
+    rewritten in place by every build (DEST_DIR == SOURCE_DIR), so for them
+    only the extracted post fields count; other sources ignore whitespace.
+    """
+    directory, filename = os.path.split(path)
+    if directory == source_path(SOURCE_DIR) and filename.endswith(".html") and filename != "index.html":
+        return post_fingerprint(extract_metadata(filename, content, verbose=False))
+    return content_fingerprint(content)
+
 def get_all_posts():
     posts = []
     if not os.path.exists(SOURCE_DIR):
@@ -171,22 +301,6 @@ def get_all_posts():
             except Exception as e:
                 print(f"Error extracting metadata from {filename}: {e}")
     
-    def parse_date(d):
-        if not d:
-            return datetime.datetime.min
-        try:
-            return datetime.datetime.strptime(d, "%Y-%m-%d")
-        except ValueError:
-            try:
-                return datetime.datetime.strptime(d, "%Y年%m月%d日")
-            except ValueError:
-                # Try handling single digit month/day just in case
-                try:
-                    return datetime.datetime.strptime(d, "%Y年%-m月%-d日")
-                except ValueError:
-                    print(f"Warning: Could not parse date '{d}', using min date.")
-                    return datetime.datetime.min
-    
     posts.sort(key=lambda x: parse_date(x['date']), reverse=True)
     return posts
 
@@ -376,6 +490,8 @@ def build_home(posts):
     full_html = full_html.replace('src="/assets/', 'src="/assets/')
     
     write_file("index.html", full_html)
+    register_page("index.html", "/", "home", home_body, blog_posts_html,
+                  sources=[HOME_BODY_TEMPLATE] + post_sources(posts))
     print("index.html built.")
     return 1
 
@@ -505,6 +621,8 @@ def build_blog_index(posts):
     if not os.path.exists(DEST_DIR):
         os.makedirs(DEST_DIR)
     write_file(os.path.join(DEST_DIR, "index.html"), full_html)
+    register_page(os.path.join(DEST_DIR, "index.html"), "/blog/", "blog_index", blog_index_body, blog_grid_html,
+                  sources=[BLOG_INDEX_BODY_TEMPLATE] + post_sources(posts))
     print("blog/index.html built.")
     return 1
 
@@ -531,6 +649,8 @@ def build_about():
     full_html = full_html.replace("{{ schema }}", "")
     
     write_file(os.path.join(OUTPUT_DIR, "about.html"), full_html)
+    register_page(os.path.join(OUTPUT_DIR, "about.html"), "/about", "page", about_body,
+                  sources=[ABOUT_BODY_TEMPLATE])
     print("about.html built.")
     return 1
 
@@ -558,6 +678,8 @@ def build_policies():
     full_html = full_html.replace("{{ schema }}", "")
     
     write_file(os.path.join(OUTPUT_DIR, "policies.html"), full_html)
+    register_page(os.path.join(OUTPUT_DIR, "policies.html"), "/policies", "page", policies_body,
+                  sources=[POLICIES_BODY_TEMPLATE])
     print("policies.html built.")
     return 1
 
@@ -639,6 +761,32 @@ def recommend_posts(current_post, all_posts, ref_counts):
         # 返回前4篇
         return [c[1] for c in candidates[:4]]
 
+def build_speculation_rules(urls):
+    """Returns the <script type="speculationrules"> block (plus optional prefetch fallback) for urls."""
+    if not urls or PREFETCH_MAX_URLS <= 0:
+        return ""
+    rules = {"prefetch": [{"source": "list", "urls": urls, "eagerness": PREFETCH_EAGERNESS}]}
+    html = f'<script type="speculationrules">{json.dumps(rules, ensure_ascii=False)}</script>'
+    if PREFETCH_FALLBACK:
+        html += textwrap.dedent(f'''
+        <script>
+          (function(){{
+            if(HTMLScriptElement.supports && HTMLScriptElement.supports('speculationrules')) return;
+            {json.dumps(urls, ensure_ascii=False)}.forEach(function(u){{
+              var l = document.createElement('link'); l.rel = 'prefetch'; l.href = u; document.head.appendChild(l);
+            }});
+          }})();
+        </script>''').rstrip()
+    return html
+
+def get_prefetch_urls(related_posts):
+    """Top related posts first, then the blog index, capped at PREFETCH_MAX_URLS."""
+    if PREFETCH_MAX_URLS <= 0:
+        return []
+    urls = [rp['url'] for rp in related_posts][:max(PREFETCH_MAX_URLS - 1, 0)]
+    urls.append("/blog/")
+    return urls[:PREFETCH_MAX_URLS]
+
 # 4. 文章详情页构建
 def build_posts_pages(posts):
     print("Building Post Pages...")
@@ -709,6 +857,7 @@ def build_posts_pages(posts):
         <meta name="twitter:description" content="{post['description']}">
         <meta name="twitter:image" content="{post['image_url']}">
         ''').strip()
+        post_head_meta += "\n" + build_speculation_rules(get_prefetch_urls(related_sample))
         full_html = full_html.replace("{{ head_meta }}", post_head_meta)
         
         article_schema = {
@@ -753,11 +902,205 @@ def build_posts_pages(posts):
         if not os.path.exists(DEST_DIR):
             os.makedirs(DEST_DIR)
         write_file(os.path.join(DEST_DIR, post['filename']), full_html)
+        register_page(os.path.join(DEST_DIR, post['filename']), post['url'], "post", post['clean_title'], post['description'], post['content'],
+                      sources=post_sources([post]))
         print(f"Built {post['filename']}")
         count += 1
     return count
 
 # 5. Sitemap 构建
+def load_json_state(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read {path}: {e}")
+        return default
+
+def save_json_state(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+def git_source_dates(paths):
+    """
+    {path: 内容最后一次变化的提交日期 (YYYY-MM-DD)}
+    一次 git log 取全部路径的提交历史，再用一个 git cat-file --batch 读取各版本：
+    从新到旧比较 source_digest()，与工作区内容相同的最早一个连续提交即内容最后变化的时间
+    (只重写了 VERSION 等构建产物的提交不算变化)。
+    工作区有未提交的修改时值为 None；不在 git 中的路径不返回
+    """
+    if not paths:
+        return {}
+    try:
+        out = subprocess.run(["git", "log", "--format=@%H %cI", "--name-only", "--", *paths],
+                             capture_output=True, text=True, encoding="utf-8", check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    history = {} # path -> [(commit, date), ...] 从新到旧
+    commit = None
+    for line in out.splitlines():
+        if line.startswith("@"):
+            commit, date = line[1:].split(" ", 1)
+        elif line and commit:
+            history.setdefault(line, []).append((commit, date[:10]))
+
+    dates = {}
+    try:
+        reader = subprocess.Popen(["git", "cat-file", "--batch"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    except OSError:
+        return {}
+    with reader:
+        for path in paths:
+            revisions = history.get(path)
+            if not revisions:
+                continue
+            try:
+                current = source_digest(path, read_file(path))
+            except OSError:
+                continue
+            dates[path] = None
+            for commit, date in revisions:
+                reader.stdin.write(f"{commit}:{path}\n".encode("utf-8"))
+                reader.stdin.flush()
+                header = reader.stdout.readline().split()
+                if len(header) != 3: # "<object> missing": 该提交删除了此文件
+                    break
+                blob = reader.stdout.read(int(header[2]) + 1)[:-1]
+                if source_digest(path, blob.decode("utf-8", errors="replace")) != current:
+                    break
+                dates[path] = date
+        reader.stdin.close()
+    return dates
+
+def resolve_lastmods(manifest, post_dates):
+    """
+    lastmod = 页面内容最后一次变化的时间 (而非构建时间)
+    1. 指纹未变 -> 沿用上次记录的 lastmod
+    2. 指纹变化 -> 记为今天
+    3. 首次出现 (全新 checkout / CI 没有 .build/) -> 取源文件 (正文模板、文章源文件)
+       在 git 中内容最后一次变化的日期；源文件有未提交的修改时记为今天；
+       源文件都不在 git 中时，文章用发布日期，其余页面记为今天
+    """
+    state = load_json_state(LASTMOD_STATE_FILE, {})
+    today = datetime.date.today().isoformat()
+    committed = git_source_dates(sorted({src for page in manifest if page['url'] not in state
+                                         for src in page['sources']}))
+    new_state = {}
+    lastmods = {}
+    for page in manifest:
+        url = page['url']
+        prev = state.get(url)
+        tracked = [src for src in page['sources'] if src in committed]
+        if prev and prev.get("fingerprint") == page['fingerprint']:
+            lastmod = prev['lastmod']
+        elif prev is None and tracked:
+            source_dates = [committed[src] for src in tracked]
+            lastmod = max(source_dates) if len(tracked) == len(page['sources']) and all(source_dates) else today
+        elif prev is None and url in post_dates:
+            published = parse_date(post_dates[url])
+            lastmod = published.date().isoformat() if published != datetime.datetime.min else today
+        else:
+            lastmod = today
+        new_state[url] = {"fingerprint": page['fingerprint'], "lastmod": lastmod}
+        lastmods[url] = lastmod
+    save_json_state(LASTMOD_STATE_FILE, new_state)
+    return lastmods
+
+class SitemapWriter:
+    """
+    Streams <url> entries to disk instead of building one big string.
+    Rolls over to a new part at SITEMAP_MAX_URLS / SITEMAP_MAX_BYTES; if more than
+    one part is written (or gzip is on), sitemap.xml becomes a sitemap index.
+    """
+    HEADER = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+    FOOTER = '</urlset>\n'
+
+    def __init__(self, output_dir, base_name="sitemap", gzip_output=False,
+                 max_urls=SITEMAP_MAX_URLS, max_bytes=SITEMAP_MAX_BYTES):
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.gzip_output = gzip_output
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.parts = [] # (filename, lastmod)
+        self.url_count = 0
+        self._fh = None
+
+    def _part_name(self, n):
+        return f"{self.base_name}-{n}.xml" + (".gz" if self.gzip_output else "")
+
+    def _open_part(self):
+        name = self._part_name(len(self.parts) + 1)
+        path = os.path.join(self.output_dir, name)
+        self._fh = gzip.open(path, "wb") if self.gzip_output else open(path, "wb")
+        self._fh.write(self.HEADER.encode("utf-8"))
+        self._part_urls = 0
+        self._part_bytes = len(self.HEADER.encode("utf-8"))
+        self._part_lastmod = None
+        self.parts.append([name, None])
+
+    def _close_part(self):
+        self._fh.write(self.FOOTER.encode("utf-8"))
+        self._fh.close()
+        self._fh = None
+        self.parts[-1][1] = self._part_lastmod
+
+    def add(self, loc, lastmod=None, changefreq=None, priority=None):
+        entry = f"  <url>\n    <loc>{xml_escape(loc)}</loc>\n"
+        if lastmod:
+            entry += f"    <lastmod>{lastmod}</lastmod>\n"
+        if changefreq:
+            entry += f"    <changefreq>{changefreq}</changefreq>\n"
+        if priority:
+            entry += f"    <priority>{priority}</priority>\n"
+        entry += "  </url>\n"
+        data = entry.encode("utf-8")
+
+        footer_len = len(self.FOOTER.encode("utf-8"))
+        if self._fh is not None and (self._part_urls >= self.max_urls or self._part_bytes + len(data) + footer_len > self.max_bytes):
+            self._close_part()
+        if self._fh is None:
+            self._open_part()
+
+        self._fh.write(data)
+        self._part_urls += 1
+        self._part_bytes += len(data)
+        self.url_count += 1
+        if lastmod and (self._part_lastmod is None or lastmod > self._part_lastmod):
+            self._part_lastmod = lastmod
+
+    def close(self):
+        """Finishes the last part, writes the index if needed and removes stale parts. Returns written filenames."""
+        if self._fh is None and not self.parts:
+            self._open_part()
+        if self._fh is not None:
+            self._close_part()
+
+        main_name = f"{self.base_name}.xml"
+        if len(self.parts) == 1 and not self.gzip_output:
+            os.replace(os.path.join(self.output_dir, self.parts[0][0]), os.path.join(self.output_dir, main_name))
+            written = [main_name]
+        else:
+            index_xml = f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+            for name, lastmod in self.parts:
+                index_xml += f"  <sitemap>\n    <loc>{xml_escape(SITE_URL + '/' + name)}</loc>\n"
+                if lastmod:
+                    index_xml += f"    <lastmod>{lastmod}</lastmod>\n"
+                index_xml += "  </sitemap>\n"
+            index_xml += '</sitemapindex>\n'
+            with open(os.path.join(self.output_dir, main_name), "w", encoding="utf-8") as f:
+                f.write(index_xml)
+            written = [main_name] + [name for name, _ in self.parts]
+
+        # 清理上次构建遗留的多余分片
+        for stale in glob.glob(os.path.join(self.output_dir, f"{self.base_name}-*.xml*")):
+            if os.path.basename(stale) not in written:
+                os.remove(stale)
+        return written
+
 def build_sitemap(posts):
     print("Building Sitemap...")
     layout = read_file(LAYOUT_TEMPLATE)
@@ -790,41 +1133,486 @@ def build_sitemap(posts):
     full_html = full_html.replace("{{ schema }}", "")
     
     write_file(os.path.join(OUTPUT_DIR, "sitemap.html"), full_html)
+    register_page(os.path.join(OUTPUT_DIR, "sitemap.html"), "/sitemap", "page", sitemap_body, sitemap_list_html,
+                  sources=[SITEMAP_BODY_TEMPLATE] + post_sources(posts))
     
     # XML Sitemap
-    sitemap_xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    sitemap_xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-    
     # Define pages with specific frequencies and priorities
-    static_pages_config = [
-        {"loc": "", "freq": "weekly", "prio": "1.0"},
-        {"loc": "about", "freq": "monthly", "prio": "0.8"},
-        {"loc": "blog/", "freq": "weekly", "prio": "0.9"},
-        {"loc": "sitemap", "freq": "weekly", "prio": "0.5"},
-        {"loc": "policies", "freq": "monthly", "prio": "0.5"}
-    ]
+    static_pages_config = {
+        "/": {"freq": "weekly", "prio": "1.0"},
+        "/about": {"freq": "monthly", "prio": "0.8"},
+        "/blog/": {"freq": "weekly", "prio": "0.9"},
+        "/sitemap": {"freq": "weekly", "prio": "0.5"},
+        "/policies": {"freq": "monthly", "prio": "0.5"}
+    }
+    post_dates = {post['url']: post['date'] for post in posts}
+    lastmods = resolve_lastmods(BUILD_MANIFEST, post_dates)
+    
+    writer = SitemapWriter(OUTPUT_DIR, gzip_output=SITEMAP_GZIP)
+    for url, p_conf in static_pages_config.items():
+        writer.add(SITE_URL + url, lastmods.get(url), p_conf['freq'], p_conf['prio'])
     
-    for p_conf in static_pages_config:
-        sitemap_xml += f"""  <url>
-    <loc>{SITE_URL}/{p_conf['loc']}</loc>
-    <changefreq>{p_conf['freq']}</changefreq>
-    <priority>{p_conf['prio']}</priority>
-  </url>\n"""
-
     for post in posts:
         clean_url = post['url'].replace('.html', '')
-        sitemap_xml += f"""  <url>
-    <loc>{SITE_URL}{clean_url}</loc>
-    <lastmod>{post['date']}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>0.8</priority>
-  </url>\n"""
-        
-    sitemap_xml += '</urlset>'
-    write_file(os.path.join(OUTPUT_DIR, "sitemap.xml"), sitemap_xml)
+        writer.add(SITE_URL + clean_url, lastmods.get(post['url']), "weekly", "0.8")
     
-    print("Sitemaps built.")
-    return 2
+    written = writer.close()
+    print(f"Sitemaps built ({writer.url_count} URLs, {len(written)} files).")
+    return 1 + len(written)
+
+# 6. _headers 生成 (Early Hints / 分类缓存)
+HEADERS_FILE = os.path.join(OUTPUT_DIR, "_headers")
+HEADERS_BEGIN_MARKER = "# >>> build.py generated (do not edit below) >>>"
+HEADERS_END_MARKER = "# <<< build.py generated <<<"
+HEADERS_MAX_RULES = 100 # Cloudflare Pages _headers 规则上限
+
+# 按页面类型区分的 Cache-Control (assets/robots/sitemap 仍由手写规则控制)
+CACHE_CONTROL_BY_KIND = {
+    "home": "public, max-age=300, stale-while-revalidate=86400",
+    "blog_index": "public, max-age=300, stale-while-revalidate=86400",
+    "post": "public, max-age=3600, stale-while-revalidate=86400",
+    "page": "public, max-age=86400, stale-while-revalidate=604800",
+}
+
+def get_head_resources(soup, page_url):
+    """
+    Lists the stylesheets and scripts referenced in <head>, resolved against page_url.
+    blocking=True means the resource blocks rendering (no async/defer/module).
+    """
+    resources = []
+    head = soup.head
+    if head is None:
+        return resources
+    for tag in head.find_all(["link", "script"]):
+        if tag.find_parent("noscript") is not None:
+            continue
+        if tag.name == "link":
+            rel = tag.get("rel", [])
+            if isinstance(rel, str):
+                rel = rel.split()
+            if "preload" in rel and tag.get("href") and tag.get("as") in ("style", "script"):
+                # 异步加载的资源 (如 critical CSS 之后的完整样式表)：不阻塞渲染，但仍值得提前获取
+                resources.append({
+                    "url": urllib.parse.urljoin(page_url, tag["href"]),
+                    "as": tag["as"],
+                    "blocking": False,
+                    "preload": True
+                })
+                continue
+            if "stylesheet" not in rel or not tag.get("href"):
+                continue
+            media = tag.get("media", "all")
+            resources.append({
+                "url": urllib.parse.urljoin(page_url, tag["href"]),
+                "as": "style",
+                "blocking": media in ("all", "screen", "") and not tag.has_attr("disabled")
+            })
+        elif tag.get("src"):
+            blocking = not (tag.has_attr("async") or tag.has_attr("defer") or tag.get("type") == "module")
+            resources.append({
+                "url": urllib.parse.urljoin(page_url, tag["src"]),
+                "as": "script",
+                "blocking": blocking
+            })
+    return resources
+
+def get_resource_hints(html, page_url):
+    """Returns Link header values: preconnect for third-party origins, preload for render-blocking or preloaded resources."""
+    soup = BeautifulSoup(html, "html.parser")
+    site_origin = urllib.parse.urlsplit(SITE_URL)
+    hints = []
+    origins = []
+    for res in get_head_resources(soup, page_url):
+        parts = urllib.parse.urlsplit(res['url'])
+        same_origin = parts.netloc == site_origin.netloc
+        if not same_origin:
+            origin = f"{parts.scheme}://{parts.netloc}"
+            if origin not in origins:
+                origins.append(origin)
+        if res['blocking'] or res.get('preload'):
+            target = urllib.parse.urlunsplit(("", "", parts.path, parts.query, "")) if same_origin else res['url']
+            hints.append(f"<{target}>; rel=preload; as={res['as']}")
+    return [f"<{o}>; rel=preconnect" for o in origins] + hints
+
+def split_headers_file(text):
+    """Returns the hand-written part of _headers (everything outside the generated block)."""
+    if HEADERS_BEGIN_MARKER not in text:
+        return text.rstrip("\n")
+    before, rest = text.split(HEADERS_BEGIN_MARKER, 1)
+    after = rest.split(HEADERS_END_MARKER, 1)[1] if HEADERS_END_MARKER in rest else ""
+    return (before.rstrip("\n") + "\n" + after.strip("\n")).strip("\n")
+
+def headers_rule(path, hints, cache_control, detach_link=False):
+    lines = [path]
+    if detach_link:
+        # 目录通配规则的 Link 会与本规则合并，先移除
+        lines.append("  ! Link")
+    for hint in hints:
+        lines.append(f"  Link: {hint}")
+    if cache_control:
+        # 先移除通配规则 (/*, /blog/*) 继承的 Cache-Control，再设置分类值
+        lines.append("  ! Cache-Control")
+        lines.append(f"  Cache-Control: {cache_control}")
+    return "\n".join(lines) if len(lines) > 1 else None
+
+def build_headers(manifest):
+    """
+    Generated _headers rules. Pages in the same directory (one template, e.g.
+    /blog/*) share one splat rule with their most common hints and
+    Cache-Control; only pages that differ get their own rule. Root-level
+    pages always get per-page rules (a /* splat would also hit /assets/).
+    Fails the build if the host's rule limit would be exceeded.
+    """
+    print("Building _headers...")
+    manual = split_headers_file(read_file(HEADERS_FILE)) if os.path.exists(HEADERS_FILE) else ""
+    manual_rules = sum(1 for line in manual.splitlines() if line.startswith("/"))
+
+    signatures = {}
+    for page in sorted(manifest, key=lambda p: p['url']):
+        hints = tuple(get_resource_hints(read_file(page['path']), SITE_URL + page['url']))
+        signatures[page['url']] = (hints, CACHE_CONTROL_BY_KIND.get(page['kind']))
+
+    # Splats match across "/", so group by top-level directory: each URL is covered by at most one splat
+    groups = {}
+    for url in signatures:
+        top, sep, _ = url[1:].partition("/")
+        if sep:
+            groups.setdefault(f"/{top}/*", []).append(url)
+
+    generated = []
+    shared = {} # url -> signature of the splat rule that also matches it
+    for splat, urls in sorted(groups.items()):
+        members = [u for u in urls if u != splat[:-1]] # the directory index (/blog/) is not a template page
+        if len(members) < 2:
+            continue
+        signature, count = Counter(signatures[u] for u in members).most_common(1)[0]
+        if count < 2:
+            continue
+        rule = headers_rule(splat, *signature)
+        if rule:
+            generated.append(rule)
+        for u in urls:
+            shared[u] = signature
+
+    for url, signature in signatures.items():
+        if shared.get(url) == signature:
+            continue
+        detach_link = bool(url in shared and shared[url][0])
+        rule = headers_rule(url, *signature, detach_link=detach_link)
+        if rule:
+            generated.append(rule)
+
+    total_rules = manual_rules + len(generated)
+    if total_rules > HEADERS_MAX_RULES:
+        print(f"Build failed: _headers would have {total_rules} rules (limit {HEADERS_MAX_RULES}); the host ignores rules past the limit.")
+        sys.exit(1)
+
+    content = manual + "\n\n" + HEADERS_BEGIN_MARKER + "\n" + "\n\n".join(generated) + "\n" + HEADERS_END_MARKER + "\n"
+    with open(HEADERS_FILE, "w", encoding="utf-8") as f:
+        f.write(content.lstrip("\n"))
+    print(f"_headers built ({len(generated)} generated rules).")
+    return 1
+
+# 7. Service Worker 生成
+SERVICE_WORKER_FILE = os.path.join(OUTPUT_DIR, "sw.js")
+SW_PRECACHE_KINDS = ["home", "blog_index"] # 预缓存的页面类型，文章页走 stale-while-revalidate
+SW_RUNTIME_MAX_ENTRIES = 50 # 文章页运行时缓存的条目上限，超出时淘汰最早写入的
+
+def get_precache_assets(manifest):
+    """Collects the same-origin /assets/ URLs referenced in <head> of the built pages."""
+    assets = []
+    for page in manifest:
+        soup = BeautifulSoup(read_file(page['path']), "html.parser")
+        if soup.head is None:
+            continue
+        page_url = SITE_URL + page['url']
+        for tag in soup.head.find_all(["link", "script"]):
+            ref = tag.get("href") if tag.name == "link" else tag.get("src")
+            if not ref:
+                continue
+            parts = urllib.parse.urlsplit(urllib.parse.urljoin(page_url, ref))
+            if parts.netloc != SITE_DOMAIN or not parts.path.startswith("/assets/"):
+                continue
+            local_path = os.path.join(OUTPUT_DIR, parts.path.lstrip("/"))
+            url = parts.path + (f"?{parts.query}" if parts.query else "")
+            if os.path.isfile(local_path) and url not in assets:
+                assets.append(url)
+    return sorted(assets)
+
+def build_service_worker(manifest):
+    print("Building Service Worker...")
+    assets = get_precache_assets(manifest)
+    precache_pages = [p for p in manifest if p['kind'] in SW_PRECACHE_KINDS]
+    pages = sorted(p['url'] for p in precache_pages)
+
+    # 构建哈希：基于预缓存文件的真实内容 (忽略空白)，内容不变则缓存不失效
+    h = hashlib.sha1()
+    for url in assets:
+        h.update(url.split("?")[0].encode("utf-8"))
+        with open(os.path.join(OUTPUT_DIR, url.split("?")[0].lstrip("/")), "rb") as f:
+            h.update(f.read())
+    for page in sorted(precache_pages, key=lambda p: p['path']):
+        h.update(page['path'].encode("utf-8"))
+        h.update(re.sub(r'\s+', '', read_file(page['path'])).encode("utf-8"))
+    build_hash = h.hexdigest()[:12]
+
+    sw = read_file(SERVICE_WORKER_TEMPLATE)
+    sw = sw.replace("{{ build_hash }}", build_hash)
+    sw = sw.replace("{{ precache_urls }}", json.dumps(assets, ensure_ascii=False))
+    sw = sw.replace("{{ precache_pages }}", json.dumps(pages, ensure_ascii=False))
+    sw = sw.replace("{{ runtime_max_entries }}", str(SW_RUNTIME_MAX_ENTRIES))
+    write_file(SERVICE_WORKER_FILE, sw)
+    print(f"sw.js built (build {build_hash}, {len(assets)} assets, {len(pages)} pages precached).")
+    return 1
+
+# 8. Critical CSS 内联
+CRITICAL_CSS_SOURCE = LAYOUT_STYLESHEET
+CRITICAL_FOLD_NODES = 150 # 首屏估算：<body> 中按文档顺序的前 N 个元素
+# 交互态伪类 / 伪元素在静态匹配时去掉，只按宿主元素判断
+CSS_PSEUDO_STATE_RE = re.compile(r'::?(?:before|after|selection|placeholder|marker|first-line|first-letter|-webkit-[\w-]+|-moz-[\w-]+|hover|focus-visible|focus-within|focus|active|visited|target)(?![\w-])')
+
+def parse_css_blocks(css):
+    """
+    Minimal stylesheet splitter: returns [(prelude, body, children)], where
+    statements like @import have body None and @media/@supports have children.
+    """
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    blocks = []
+    i = 0
+    n = len(css)
+    while i < n:
+        brace = css.find("{", i)
+        semi = css.find(";", i)
+        if brace == -1 and semi == -1:
+            break
+        if semi != -1 and (brace == -1 or semi < brace):
+            blocks.append((css[i:semi].strip(), None, None))
+            i = semi + 1
+            continue
+        prelude = css[i:brace].strip()
+        depth = 0
+        j = brace
+        while j < n:
+            if css[j] == "{":
+                depth += 1
+            elif css[j] == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            j += 1
+        body = css[brace + 1:j]
+        children = parse_css_blocks(body) if prelude.startswith(("@media", "@supports")) else None
+        blocks.append((prelude, body.strip(), children))
+        i = j + 1
+    return blocks
+
+def get_fold_soup(html):
+    """Parses html and drops every <body> element after the first CRITICAL_FOLD_NODES (the estimated fold)."""
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.body is None:
+        return soup
+    below_fold = soup.body.find_all(True)[CRITICAL_FOLD_NODES:]
+    for el in below_fold:
+        if not el.decomposed:
+            el.decompose()
+    return soup
+
+def selector_matches(fold_soup, selector_list):
+    for selector in selector_list.split(","):
+        selector = CSS_PSEUDO_STATE_RE.sub("", selector).strip()
+        if not selector:
+            continue
+        try:
+            if fold_soup.select_one(selector) is not None:
+                return True
+        except Exception:
+            # Unsupported selector: keep the rule rather than risk a flash of unstyled content
+            return True
+    return False
+
+def extract_critical_css(blocks, fold_soup):
+    out = []
+    for prelude, body, children in blocks:
+        if body is None or prelude.startswith(("@font-face", "@keyframes", "@page")):
+            continue # @import 等语句与动画随完整样式表异步加载
+        if children is not None:
+            inner = extract_critical_css(children, fold_soup)
+            if inner:
+                out.append(f"{prelude}{{{inner}}}")
+        elif selector_matches(fold_soup, prelude):
+            body = re.sub(r'\s*\n\s*', '', body)
+            out.append(f"{prelude}{{{body}}}")
+    return "".join(out)
+
+def stylesheet_used(blocks, soup):
+    """True if any style rule (including inside @media / @supports) matches an element of soup."""
+    for prelude, body, children in blocks:
+        if children is not None:
+            if stylesheet_used(children, soup):
+                return True
+        elif body is not None and not prelude.startswith("@") and selector_matches(soup, prelude):
+            return True
+    return False
+
+def inline_critical_css(manifest):
+    """
+    Computes the above-the-fold subset of blog.css once per page kind (using the
+    first page of that kind as the sample), inlines it into <head> of every page
+    of that kind, and switches the full stylesheet to a non-blocking preload.
+    Pages that no blog.css rule applies to drop the stylesheet altogether, so
+    they neither load nor preload it (see get_resource_hints()).
+    """
+    print("Inlining Critical CSS...")
+    if not os.path.exists(CRITICAL_CSS_SOURCE):
+        print(f"Warning: {CRITICAL_CSS_SOURCE} not found, skipping critical CSS.")
+        return 0
+    blocks = parse_css_blocks(read_file(CRITICAL_CSS_SOURCE))
+    css_name = re.escape(os.path.basename(CRITICAL_CSS_SOURCE))
+    link_re = re.compile(r'<link(?=[^>]*\brel="stylesheet")[^>]*\bhref="([^"]*' + css_name + r'[^"]*)"[^>]*>')
+
+    critical_by_kind = {}
+    for page in manifest:
+        html = read_file(page['path'])
+        match = link_re.search(html)
+        if not match:
+            continue
+        if not stylesheet_used(blocks, BeautifulSoup(html, "html.parser")):
+            with open(page['path'], "w", encoding="utf-8") as f:
+                f.write(html[:match.start()] + html[match.end():])
+            print(f"  - {page['url']}: no {os.path.basename(CRITICAL_CSS_SOURCE)} rule applies, stylesheet removed")
+            continue
+        if page['kind'] not in critical_by_kind:
+            critical_by_kind[page['kind']] = extract_critical_css(blocks, get_fold_soup(html))
+            print(f"  - {page['kind']}: {len(critical_by_kind[page['kind']])} bytes critical CSS")
+        href = match.group(1)
+        critical = critical_by_kind[page['kind']]
+        replacement = (
+            (f'<style id="critical-css">{critical}</style>\n' if critical else '') +
+            f'<link as="style" href="{href}" onload="this.onload=null;this.rel=\'stylesheet\'" rel="preload"/>\n'
+            f'<noscript><link href="{href}" rel="stylesheet"/></noscript>'
+        )
+        html = html[:match.start()] + replacement + html[match.end():]
+        with open(page['path'], "w", encoding="utf-8") as f:
+            f.write(html)
+    return 0
+
+# 9. 页面体积预算 (Performance Budget)
+BUDGET_FILE = "budget.json"
+WEIGHT_TREND_FILE = "weight_trend.csv" # 与构建产物一起提交，CI / 全新 checkout 也能与上次构建比较 (不放 .build/)
+WEIGHT_TREND_MAX_BUILDS = 200 # 趋势文件只保留最近 N 次构建，控制提交体积
+WEIGHT_TREND_FIELDS = ["build", "date", "url", "html_bytes", "asset_bytes", "total_bytes", "blocking_resources", "third_party_scripts", "dom_nodes"]
+WEIGHT_REGRESSION_RATIO = 0.10 # 总体积比上次构建增长超过 10% 时提示
+PAGE_LOAD_LINK_RELS = {"stylesheet", "preload", "modulepreload", "icon"}
+
+def measure_page_weight(page):
+    """Per-page transfer weight: HTML bytes, local asset bytes, render-blocking and third-party counts, DOM size."""
+    with open(page['path'], "rb") as f:
+        raw = f.read()
+    soup = BeautifulSoup(raw.decode("utf-8"), "html.parser")
+    page_url = SITE_URL + page['url']
+
+    refs = set()
+    third_party_scripts = 0
+    for tag in soup.find_all(["img", "script", "link", "source", "video", "audio", "iframe"]):
+        if tag.find_parent("noscript") is not None:
+            continue
+        if tag.name == "link":
+            rel = tag.get("rel", [])
+            if isinstance(rel, str):
+                rel = rel.split()
+            ref = tag.get("href") if PAGE_LOAD_LINK_RELS.intersection(rel) else None
+        else:
+            ref = tag.get("src")
+        if not ref or ref.startswith("data:"):
+            continue
+        parts = urllib.parse.urlsplit(urllib.parse.urljoin(page_url, ref))
+        if parts.netloc == SITE_DOMAIN:
+            refs.add(parts.path)
+        elif tag.name == "script":
+            third_party_scripts += 1
+
+    asset_bytes = 0
+    for path in refs:
+        local_path = os.path.join(OUTPUT_DIR, urllib.parse.unquote(path).lstrip("/"))
+        if os.path.isfile(local_path):
+            asset_bytes += os.path.getsize(local_path)
+
+    blocking = sum(1 for res in get_head_resources(soup, page_url) if res['blocking'])
+    return {
+        "html_bytes": len(raw),
+        "asset_bytes": asset_bytes,
+        "total_bytes": len(raw) + asset_bytes,
+        "blocking_resources": blocking,
+        "third_party_scripts": third_party_scripts,
+        "dom_nodes": len(soup.find_all(True)),
+    }
+
+def get_page_budget(budget, page):
+    """default <- kinds[kind] <- pages[url]; later entries override earlier ones."""
+    limits = dict(budget.get("default", {}))
+    limits.update(budget.get("kinds", {}).get(page['kind'], {}))
+    limits.update(budget.get("pages", {}).get(page['url'], {}))
+    return limits
+
+def load_weight_trend():
+    """Returns the trend file as [(build, [row, ...]), ...], oldest build first."""
+    if not os.path.exists(WEIGHT_TREND_FILE):
+        return []
+    builds = []
+    with open(WEIGHT_TREND_FILE, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if not builds or builds[-1][0] != row['build']:
+                builds.append((row['build'], []))
+            builds[-1][1].append(row)
+    return builds
+
+def save_weight_trend(builds):
+    with open(WEIGHT_TREND_FILE, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=WEIGHT_TREND_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for _, rows in builds[-WEIGHT_TREND_MAX_BUILDS:]:
+            writer.writerows(rows)
+
+def check_page_budgets(manifest):
+    """
+    Measures every built page against budget.json, appends the results to the
+    trend file and reports regressions. Returns False if the budget mode is
+    "fail" and at least one page is over budget.
+    """
+    print("Checking Page Weight Budgets...")
+    budget = load_json_state(BUDGET_FILE, {})
+    mode = budget.get("mode", "warn")
+    trend = load_weight_trend()
+    previous = {row['url']: row for row in trend[-1][1]} if trend else {}
+
+    violations = []
+    regressions = []
+    trend_rows = []
+    for page in sorted(manifest, key=lambda p: p['url']):
+        metrics = measure_page_weight(page)
+        for metric, limit in get_page_budget(budget, page).items():
+            if metric in metrics and metrics[metric] > limit:
+                violations.append(f"{page['url']}: {metric} = {metrics[metric]} (budget {limit})")
+        prev = previous.get(page['url'])
+        if prev and int(prev['total_bytes']) > 0:
+            growth = (metrics['total_bytes'] - int(prev['total_bytes'])) / int(prev['total_bytes'])
+            if growth > WEIGHT_REGRESSION_RATIO:
+                regressions.append(f"{page['url']}: {prev['total_bytes']} -> {metrics['total_bytes']} bytes (+{growth:.0%})")
+        trend_rows.append(dict(metrics, build=VERSION, date=datetime.date.today().isoformat(), url=page['url']))
+
+    trend.append((VERSION, trend_rows))
+    save_weight_trend(trend)
+
+    total = sum(r['total_bytes'] for r in trend_rows)
+    print(f"  - {len(trend_rows)} pages, {total / 1024:.1f} KB total (trend: {WEIGHT_TREND_FILE})")
+    for r in regressions:
+        print(f"  - Weight regression: {r}")
+    if violations:
+        label = "ERROR" if mode == "fail" else "Warning"
+        print(f"{label}: {len(violations)} budget violation(s):")
+        for v in violations:
+            print(f"  - {v}")
+    return not (violations and mode == "fail")
 
 def main():
     print("Starting Build Process...")
@@ -838,12 +1626,26 @@ def main():
     total_files += build_blog_index(posts)
     total_files += build_posts_pages(posts)
     total_files += build_sitemap(posts)
+    inline_critical_css(BUILD_MANIFEST)
+    total_files += build_headers(BUILD_MANIFEST)
+    total_files += build_service_worker(BUILD_MANIFEST)
+    
+    budget_ok = check_page_budgets(BUILD_MANIFEST)
+    if REWRITTEN_LINKS:
+        print(f"Rewrote {len(REWRITTEN_LINKS)} redirected internal links to their final targets ({REDIRECTS_FILE}).")
+    if SITE_REDIRECTS is not None:
+        for problem in SITE_REDIRECTS.problems:
+            print(f"Warning: {problem}")
     
     print(f"Build Complete! Generated {total_files} files.")
     
     if os.path.exists("preview_card.html"):
         os.remove("preview_card.html")
         print("Removed preview_card.html (cleanup)")
+    
+    if not budget_ok:
+        print("Build failed: page weight budget exceeded (see budget.json).")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import jieba
 from collections import Counter
 import re
@@ -11,18 +12,44 @@ from urllib.parse import urlparse
 # ==========================================
 # 1. 智能数据加载与清洗 
 # ==========================================
-def clean_metric(x):
-    if pd.isna(x): return 0
-    x_str = str(x).strip()
-    has_percent = '%' in x_str
-    x_clean = x_str.replace('%', '').replace(',', '')
+METRIC_COLUMNS = ['展示', '点击次数', '点击率', '排名']
+INT_METRICS = ['展示', '点击次数']
+
+def clean_metric(col):
+    """
+    整列清洗 GSC 指标 (向量化, 结果与逐格清洗一致):
+    去掉千分位逗号与 %，空值 / 无法解析记为 0；
+    不带 % 且 <= 1 的小数视为 0-1 比例 (CTR)，换算为百分数。
+    """
+    if pd.api.types.is_integer_dtype(col) or pd.api.types.is_bool_dtype(col):
+        return col.astype(float)
+    if pd.api.types.is_float_dtype(col):
+        # 浮点列的每个值都带小数点
+        val = col.to_numpy(dtype=float)
+        val = np.where(val <= 1.0, val * 100, val)
+        return pd.Series(np.where(np.isnan(val), 0.0, val), index=col.index)
+
+    text = np.char.strip(col.fillna('0').to_numpy(dtype=str))
+    has_percent = np.char.find(text, '%') >= 0
+    has_dot = np.char.find(text, '.') >= 0
+    if has_percent.any():
+        text = np.char.replace(text, '%', '')
+    if (np.char.find(text, ',') >= 0).any():
+        text = np.char.replace(text, ',', '')
     try:
-        val = float(x_clean)
-        if not has_percent and val <= 1.0 and '.' in x_str:
-            return val * 100
-        return val
-    except:
-        return 0
+        val = text.astype(float)
+    except ValueError:
+        val = pd.to_numeric(pd.Series(text), errors='coerce').to_numpy(dtype=float)
+    val = np.where(~has_percent & has_dot & (val <= 1.0), val * 100, val)
+    return pd.Series(np.where(np.isnan(val), 0.0, val), index=col.index)
+
+def clean_metrics(df):
+    """就地清洗 df 中存在的指标列 (展示 / 点击次数 取整)"""
+    for name in METRIC_COLUMNS:
+        if name in df.columns:
+            df[name] = clean_metric(df[name])
+            if name in INT_METRICS: df[name] = df[name].astype(int)
+    return df
 
 def load_gsc_data():
     data = {}
@@ -32,9 +59,10 @@ def load_gsc_data():
     
     if query_files and page_files and date_files:
         try:
-            data['queries'] = pd.read_csv(query_files[0])
-            data['pages'] = pd.read_csv(page_files[0])
-            data['dates'] = pd.read_csv(date_files[0])
+            # 千分位逗号交给 C 解析器处理，计数列直接读成数值列
+            data['queries'] = pd.read_csv(query_files[0], thousands=',')
+            data['pages'] = pd.read_csv(page_files[0], thousands=',')
+            data['dates'] = pd.read_csv(date_files[0], thousands=',')
             return data
         except Exception as e:
             print(f"❌ 读取 CSV 失败: {e}")
@@ -68,29 +96,65 @@ def get_top_words(queries, domain_name):
 # ==========================================
 # 3. 深度专业诊断引擎
 # ==========================================
-def query_action_engine(row):
-    imp, pos, ctr = row['展示'], row['排名'], row['点击率']
-    if pos <= 10 and ctr < 3.0 and imp > 50: 
-        return "<span class='badge bg-danger'>🔴 漏水紧急</span>", "重写标题/描述"
-    elif 11 <= pos <= 20 and imp > 30: 
-        return "<span class='badge bg-warning text-dark'>🟡 临门一脚</span>", "加权重内链"
-    elif pos > 20 and imp > 50: 
-        return "<span class='badge bg-info text-dark'>🔵 内容缺口</span>", "新建独立文章"
-    elif pos <= 10 and ctr >= 3.0: 
-        return "<span class='badge bg-success'>🟢 核心健康</span>", "保持观察"
-    return "<span class='badge bg-secondary'>⚪ 常规词</span>", "自然沉淀"
-
-def page_action_engine(row):
-    imp, pos, ctr = row['展示'], row['排名'], row['点击率']
-    if pos <= 10 and ctr < 2.0 and imp > 100: 
-        return "<span class='badge bg-danger'>🔴 CTR 严重不达标</span>", "<b>专业建议：</b>Title 缺乏诱惑力，尝试加入数字、年份[2026]或痛点词；检查 Description 是否匹配需求。"
-    elif 11 <= pos <= 20 and imp > 50: 
-        return "<span class='badge bg-warning text-dark'>🟡 第二页潜力股</span>", "<b>专业建议：</b>在全站流量 Top3 的老文章中，增加指向该页面的锚文本内链。"
-    elif pos > 20 and imp > 100:
-        return "<span class='badge bg-info text-dark'>🔵 排名低迷</span>", "<b>专业建议：</b>页面内容可能过薄（Thin Content）。建议扩充字数至 1500 字以上，或增加图片/视频。"
-    elif pos <= 10 and ctr >= 5.0:
-        return "<span class='badge bg-success'>🟢 高效提款机</span>", "<b>专业建议：</b>流量极佳。请重点检查该页面的“转化漏斗”，确保购买/下载/注册按钮非常显眼。"
-    return "<span class='badge bg-secondary'>⚪ 表现平稳</span>", "流量正常，按原计划持续观察数据变化即可。"
+# 诊断阈值 (展示 = 次数, 排名 = 平均排名, 点击率 = 百分数)
+QUERY_THRESHOLDS = {
+    "top_rank": 10, # 首页 (排名 <= 此值)
+    "page2_rank": (11, 20), # 第二页排名区间 (含两端)
+    "leak_ctr": 3.0, # 首页但 CTR 低于此值 -> 漏水
+    "leak_imp": 50,
+    "page2_imp": 30,
+    "gap_imp": 50, # 排名 20 以外但展示高于此值 -> 内容缺口
+    "healthy_ctr": 3.0,
+}
+PAGE_THRESHOLDS = {
+    "top_rank": 10,
+    "page2_rank": (11, 20),
+    "leak_ctr": 2.0,
+    "leak_imp": 100,
+    "page2_imp": 50,
+    "gap_imp": 100,
+    "healthy_ctr": 5.0,
+}
+
+# 按规则优先级排列 (漏水, 第二页, 排名低迷, 健康)，最后一项为默认
+QUERY_ACTIONS = [
+    ("<span class='badge bg-danger'>🔴 漏水紧急</span>", "重写标题/描述"),
+    ("<span class='badge bg-warning text-dark'>🟡 临门一脚</span>", "加权重内链"),
+    ("<span class='badge bg-info text-dark'>🔵 内容缺口</span>", "新建独立文章"),
+    ("<span class='badge bg-success'>🟢 核心健康</span>", "保持观察"),
+    ("<span class='badge bg-secondary'>⚪ 常规词</span>", "自然沉淀"),
+]
+PAGE_ACTIONS = [
+    ("<span class='badge bg-danger'>🔴 CTR 严重不达标</span>", "<b>专业建议：</b>Title 缺乏诱惑力，尝试加入数字、年份[2026]或痛点词；检查 Description 是否匹配需求。"),
+    ("<span class='badge bg-warning text-dark'>🟡 第二页潜力股</span>", "<b>专业建议：</b>在全站流量 Top3 的老文章中，增加指向该页面的锚文本内链。"),
+    ("<span class='badge bg-info text-dark'>🔵 排名低迷</span>", "<b>专业建议：</b>页面内容可能过薄（Thin Content）。建议扩充字数至 1500 字以上，或增加图片/视频。"),
+    ("<span class='badge bg-success'>🟢 高效提款机</span>", "<b>专业建议：</b>流量极佳。请重点检查该页面的“转化漏斗”，确保购买/下载/注册按钮非常显眼。"),
+    ("<span class='badge bg-secondary'>⚪ 表现平稳</span>", "流量正常，按原计划持续观察数据变化即可。"),
+]
+
+def diagnose(df, thresholds, actions):
+    """整表诊断 (np.select 向量化)：返回 (状态列, 动作列)，第一条命中的规则生效"""
+    imp = df['展示'].to_numpy(dtype=float)
+    pos = df['排名'].to_numpy(dtype=float)
+    ctr = df['点击率'].to_numpy(dtype=float)
+    t = thresholds
+    top = pos <= t["top_rank"]
+    conditions = [
+        top & (ctr < t["leak_ctr"]) & (imp > t["leak_imp"]),
+        (pos >= t["page2_rank"][0]) & (pos <= t["page2_rank"][1]) & (imp > t["page2_imp"]),
+        (pos > t["page2_rank"][1]) & (imp > t["gap_imp"]),
+        top & (ctr >= t["healthy_ctr"]),
+    ]
+    choice = np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+    statuses = np.array([status for status, _ in actions], dtype=object)
+    advice = np.array([action for _, action in actions], dtype=object)
+    return statuses[choice], advice[choice]
+
+def query_action_engine(df, thresholds=QUERY_THRESHOLDS):
+    return diagnose(df, thresholds, QUERY_ACTIONS)
+
+def page_action_engine(df, thresholds=PAGE_THRESHOLDS):
+    return diagnose(df, thresholds, PAGE_ACTIONS)
 
 # ==========================================
 # 4. 生成完美大盘
@@ -105,10 +169,7 @@ def generate_dashboard():
     site_domain = urlparse(str(sample_url)).netloc if "http" in str(sample_url) else "MySite"
 
     for df in [q_df, p_df, d_df]:
-        df['展示'] = df['展示'].apply(clean_metric).astype(int)
-        df['点击次数'] = df['点击次数'].apply(clean_metric).astype(int)
-        df['点击率'] = df['点击率'].apply(clean_metric)
-        if '排名' in df.columns: df['排名'] = df['排名'].apply(clean_metric)
+        clean_metrics(df)
 
     true_impressions = d_df['展示'].sum()
     true_clicks = d_df['点击次数'].sum()
@@ -119,8 +180,8 @@ def generate_dashboard():
     intent_counts = q_df['意图'].value_counts().to_dict()
     word_freq = get_top_words(q_df['热门查询'], site_domain)
 
-    q_df[['状态', '核心动作']] = q_df.apply(lambda row: pd.Series(query_action_engine(row)), axis=1)
-    p_df[['状态', '执行建议']] = p_df.apply(lambda row: pd.Series(page_action_engine(row)), axis=1)
+    q_df['状态'], q_df['核心动作'] = query_action_engine(q_df)
+    p_df['状态'], p_df['执行建议'] = page_action_engine(p_df)
 
     # 🚀 挖掘机数据
     valid_seeds_df = q_df[q_df['意图'] != '🧭 导航意图'].sort_values('展示', ascending=False).head(100)
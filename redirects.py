@@ -0,0 +1,196 @@
+import re
+import urllib.parse
+from dataclasses import dataclass, field
+
+# Cloudflare Pages _redirects 语义 (shared by audit.py and build.py)
+REDIRECTS_FILE = "_redirects"
+REDIRECT_STATUSES = {200, 301, 302, 303, 307, 308} # 200 = 内部重写 (rewrite, 浏览器无跳转)
+DEFAULT_REDIRECT_STATUS = 302
+MAX_REDIRECT_RULES = {"static": 2000, "dynamic": 100} # Cloudflare Pages 规则数上限
+MAX_REDIRECT_CHAIN = 10 # 离线解析时最多跟随的跳数
+
+PLACEHOLDER_RE = re.compile(r":([A-Za-z]\w*)")
+
+@dataclass
+class RedirectRule:
+    source: str
+    destination: str
+    status: int
+    line: int # 1-based line number in _redirects
+    pattern: re.Pattern = None # None for static rules (exact path match)
+
+    @property
+    def is_dynamic(self):
+        return self.pattern is not None
+
+    def substitute(self, match):
+        """Fills :splat and :placeholders of the destination from a pattern match."""
+        if match is None:
+            return self.destination
+        values = match.groupdict()
+        return PLACEHOLDER_RE.sub(lambda m: values.get(m.group(1)) or "", self.destination)
+
+@dataclass
+class RedirectHop:
+    path: str
+    status: int
+    destination: str
+    rule: RedirectRule
+
+@dataclass
+class RedirectResolution:
+    """Offline result of requesting a path: the rule hops taken and where they end."""
+    path: str
+    hops: list = field(default_factory=list) # [RedirectHop, ...] in request order
+    final: str = None # final path (internal) or absolute URL (external)
+    external: bool = False
+    loop: bool = False # target already visited, or more than max_hops rules applied
+    rewritten: bool = False # ended in a 200 rewrite: served in place, no browser round-trip
+
+    @property
+    def redirects(self):
+        """Hops the browser actually follows (3xx)."""
+        return [hop for hop in self.hops if hop.status != 200]
+
+    def chain(self):
+        return " -> ".join([self.path] + [hop.destination for hop in self.hops])
+
+def compile_source(source):
+    """
+    Regex for a dynamic source: * (splat, at most one) matches anything,
+    :name matches one path segment. Returns None for static sources.
+    """
+    if "*" not in source and not PLACEHOLDER_RE.search(source):
+        return None
+    parts = []
+    pos = 0
+    for m in re.finditer(r"\*|:([A-Za-z]\w*)", source):
+        parts.append(re.escape(source[pos:m.start()]))
+        parts.append("(?P<splat>.*)" if m.group(0) == "*" else f"(?P<{m.group(1)}>[^/]+)")
+        pos = m.end()
+    parts.append(re.escape(source[pos:]))
+    return re.compile("".join(parts) + r"\Z")
+
+def parse_redirects(text):
+    """
+    Parses _redirects content into (rules, problems). Lines are
+    "source destination [status]"; blank lines and # comments are skipped.
+    Invalid lines are reported in problems and left out of the rules.
+    """
+    rules, problems = [], []
+    counts = {"static": 0, "dynamic": 0}
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        if len(parts) not in (2, 3):
+            problems.append(f"_redirects:{lineno} 格式错误 (应为 \"来源 目标 [状态码]\"): {raw.strip()}")
+            continue
+        source, destination = parts[0], parts[1]
+        status = DEFAULT_REDIRECT_STATUS
+        if len(parts) == 3:
+            if not parts[2].isdigit() or int(parts[2]) not in REDIRECT_STATUSES:
+                problems.append(f"_redirects:{lineno} 不支持的状态码 {parts[2]}: {source}")
+                continue
+            status = int(parts[2])
+        if not source.startswith("/"):
+            problems.append(f"_redirects:{lineno} 来源必须是以 / 开头的路径 (不支持域名级重定向): {source}")
+            continue
+        if source.count("*") > 1:
+            problems.append(f"_redirects:{lineno} 来源只能包含一个 *: {source}")
+            continue
+        if status == 200 and not destination.startswith("/"):
+            problems.append(f"_redirects:{lineno} 200 重写只能指向站内相对路径: {destination}")
+            continue
+        pattern = compile_source(source)
+        if pattern is not None and ":splat" in destination and "*" not in source:
+            problems.append(f"_redirects:{lineno} 目标使用 :splat 但来源没有 *: {source}")
+        rule = RedirectRule(source, destination, status, lineno, pattern)
+        kind = "dynamic" if rule.is_dynamic else "static"
+        counts[kind] += 1
+        if counts[kind] == MAX_REDIRECT_RULES[kind] + 1:
+            problems.append(f"_redirects:{lineno} {kind} 规则超过 {MAX_REDIRECT_RULES[kind]} 条上限, 之后的规则不会生效")
+        rules.append(rule)
+    return rules, problems
+
+class Redirects:
+    """
+    Compiled _redirects: first matching rule (top to bottom) wins, as on the
+    host. Static sources are looked up in a dict; dynamic ones are only tried
+    up to the first static hit, so most lookups never touch a regex.
+    """
+    def __init__(self, rules, site_domain=None, problems=None):
+        self.rules = rules
+        self.problems = problems or []
+        self.site_domain = site_domain
+        self.static = {}
+        self.dynamic = []
+        for i, rule in enumerate(rules):
+            if rule.is_dynamic:
+                self.dynamic.append((i, rule))
+            else:
+                self.static.setdefault(rule.source, (i, rule))
+
+    @classmethod
+    def load(cls, path=REDIRECTS_FILE, site_domain=None):
+        """Reads and compiles a _redirects file; a missing file gives an empty rule set."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return cls([], site_domain)
+        rules, problems = parse_redirects(text)
+        return cls(rules, site_domain, problems)
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def match(self, path):
+        """(rule, destination) of the first rule matching path (no query / fragment), or None."""
+        hit = self.static.get(path)
+        limit = hit[0] if hit else len(self.rules)
+        for i, rule in self.dynamic:
+            if i >= limit:
+                break
+            m = rule.pattern.match(path)
+            if m:
+                return rule, rule.substitute(m)
+        if hit:
+            return hit[1], hit[1].destination
+        return None
+
+    def internal_path(self, url):
+        """Path of a same-site URL ("/x" or https://<site_domain>/x), None for external URLs."""
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.netloc and parsed.netloc.split(":")[0] not in (self.site_domain, f"www.{self.site_domain}"):
+            return None
+        return parsed.path or "/"
+
+    def resolve(self, path, max_hops=MAX_REDIRECT_CHAIN):
+        """Follows matching rules from path until no rule applies, the target leaves the site, or a loop."""
+        result = RedirectResolution(path, final=path)
+        seen = {path}
+        current = path
+        while len(result.hops) < max_hops:
+            hit = self.match(current)
+            if hit is None:
+                break
+            rule, destination = hit
+            result.hops.append(RedirectHop(current, rule.status, destination, rule))
+            target = self.internal_path(destination)
+            if target is None:
+                result.final, result.external = destination, True
+                break
+            if rule.status == 200:
+                # Rewrites are served in place and are not re-matched
+                result.final, result.rewritten = target, True
+                break
+            if target in seen:
+                result.final, result.loop = target, True
+                break
+            seen.add(target)
+            result.final = current = target
+        else:
+            result.loop = True
+        return result
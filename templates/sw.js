@@ -0,0 +1,89 @@
+// Generated by build.py from templates/sw.js - do not edit the root sw.js by hand.
+var BUILD_HASH = '{{ build_hash }}';
+var PRECACHE = 'x-grok-precache-' + BUILD_HASH;
+var RUNTIME = 'x-grok-pages-' + BUILD_HASH;
+var PRECACHE_URLS = {{ precache_urls }};
+var PRECACHE_PAGES = {{ precache_pages }};
+var RUNTIME_MAX_ENTRIES = {{ runtime_max_entries }};
+
+self.addEventListener('install', function(event){
+  event.waitUntil(
+    caches.open(PRECACHE)
+      .then(function(cache){ return cache.addAll(PRECACHE_URLS.concat(PRECACHE_PAGES)); })
+      .then(function(){ return self.skipWaiting(); })
+  );
+});
+
+// 构建哈希变化后清理旧版本缓存；同一版本内清理已不在清单中的资源 (如旧的 ?v= 地址)
+self.addEventListener('activate', function(event){
+  var keep = PRECACHE_URLS.concat(PRECACHE_PAGES);
+  event.waitUntil(
+    caches.keys().then(function(keys){
+      return Promise.all(keys.map(function(key){
+        if(key !== PRECACHE && key !== RUNTIME){ return caches.delete(key); }
+      }));
+    }).then(function(){
+      return caches.open(PRECACHE);
+    }).then(function(cache){
+      return cache.keys().then(function(requests){
+        return Promise.all(requests.map(function(req){
+          var url = new URL(req.url);
+          if(keep.indexOf(url.pathname + url.search) === -1){ return cache.delete(req); }
+        }));
+      });
+    }).then(function(){ return self.clients.claim(); })
+  );
+});
+
+// cache.put() 把条目写到末尾 (覆盖时先删除旧条目)，keys() 的顺序即写入顺序：超出上限时删除最早写入的
+function trimCache(cache, maxEntries){
+  return cache.keys().then(function(requests){
+    return Promise.all(requests.slice(0, Math.max(requests.length - maxEntries, 0)).map(function(req){
+      return cache.delete(req);
+    }));
+  });
+}
+
+function staleWhileRevalidate(event, cacheName, maxEntries){
+  return caches.open(cacheName).then(function(cache){
+    return cache.match(event.request).then(function(cached){
+      var network = fetch(event.request).then(function(response){
+        if(response && response.ok){
+          var stored = cache.put(event.request, response.clone());
+          if(maxEntries){ stored = stored.then(function(){ return trimCache(cache, maxEntries); }); }
+          event.waitUntil(stored.catch(function(){}));
+        }
+        return response;
+      });
+      if(cached){
+        event.waitUntil(network.catch(function(){}));
+        return cached;
+      }
+      return network;
+    });
+  });
+}
+
+self.addEventListener('fetch', function(event){
+  var request = event.request;
+  if(request.method !== 'GET') return;
+  var url = new URL(request.url);
+  if(url.origin !== self.location.origin) return;
+
+  // 1. 带版本号的静态资源: cache-first
+  if(PRECACHE_URLS.indexOf(url.pathname + url.search) !== -1){
+    event.respondWith(
+      caches.match(request).then(function(cached){ return cached || fetch(request); })
+    );
+    return;
+  }
+  // 2. 首页 / 教程导航: 预缓存 + 后台刷新
+  if(PRECACHE_PAGES.indexOf(url.pathname) !== -1){
+    event.respondWith(staleWhileRevalidate(event, PRECACHE));
+    return;
+  }
+  // 3. 文章页: stale-while-revalidate，最多保留 RUNTIME_MAX_ENTRIES 页
+  if(url.pathname.indexOf('/blog/') === 0){
+    event.respondWith(staleWhileRevalidate(event, RUNTIME, RUNTIME_MAX_ENTRIES));
+  }
+});